@@ -0,0 +1,253 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import re
+import time
+from collections import deque
+from typing import Any
+
+from logging_config import get_logger
+
+# ==========================
+# CONFIG
+# ==========================
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+# Analysis requests allowed to run at once; the rest wait in a priority queue.
+ADMISSION_MAX_CONCURRENT = max(1, int(os.getenv("ADMISSION_MAX_CONCURRENT", "8")))
+ADMISSION_MAX_QUEUE = max(0, int(os.getenv("ADMISSION_MAX_QUEUE", "32")))
+# Kept below the 60s client timeout so a request is refused rather than left to time out.
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "30"))
+ADMISSION_RATE_PER_MINUTE = float(os.getenv("ADMISSION_RATE_PER_MINUTE", "30"))
+ADMISSION_BURST = max(1.0, float(os.getenv("ADMISSION_BURST", "10")))
+# Header identifying the client for rate limiting (e.g. X-Forwarded-For behind a
+# proxy); the peer address is used when empty or absent.
+ADMISSION_CLIENT_HEADER = os.getenv("ADMISSION_CLIENT_HEADER", "").strip()
+ADMISSION_DEFAULT_PRIORITY = os.getenv("ADMISSION_DEFAULT_PRIORITY", "batch").strip().lower()
+# Client ids (as resolved for rate limiting) allowed to claim critical priority
+# without the admin token, e.g. the alerting system.
+ADMISSION_CRITICAL_CLIENTS = {
+    client.strip() for client in os.getenv("ADMISSION_CRITICAL_CLIENTS", "").split(",") if client.strip()
+}
+
+# Lower value is served first.
+PRIORITIES = {"critical": 0, "interactive": 1, "batch": 2}
+if ADMISSION_DEFAULT_PRIORITY not in PRIORITIES:
+    raise ValueError(
+        f"Unsupported ADMISSION_DEFAULT_PRIORITY '{ADMISSION_DEFAULT_PRIORITY}'. "
+        f"Use one of: {', '.join(PRIORITIES)}."
+    )
+# Values of the structured ``severity`` field that ask for critical priority.
+_CRITICAL_SEVERITIES = {"critical", "sev0", "sev1", "p0"}
+_WAIT_SAMPLES = 1000
+_MAX_TRACKED_CLIENTS = 10000
+
+logger = get_logger(__name__)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: float) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def classify_priority(requested: str | None, severity: str | None = None, trusted: bool = False) -> str:
+    """Priority class from the header or a structured severity; critical only for trusted callers."""
+    requested = (requested or "").strip().lower()
+    if re.sub(r"[\s_-]", "", (severity or "").lower()) in _CRITICAL_SEVERITIES:
+        requested = "critical"
+    if requested not in PRIORITIES or (requested == "critical" and not trusted):
+        return ADMISSION_DEFAULT_PRIORITY
+    return requested
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets: ``burst`` requests at once, refilled at ``rate_per_minute``."""
+
+    def __init__(self, rate_per_minute: float, burst: float) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def try_acquire(self, client_id: str, now: float | None = None) -> float:
+        """Take a token; return 0 on success or the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        tokens, updated = self._buckets.get(client_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[client_id] = (tokens - 1, now)
+            self._prune(now)
+            return 0.0
+        self._buckets[client_id] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+    def _prune(self, now: float) -> None:
+        if len(self._buckets) <= _MAX_TRACKED_CLIENTS:
+            return
+        # Buckets that have refilled completely carry no state worth keeping.
+        full_after = self.burst / self.rate
+        self._buckets = {
+            client: state for client, state in self._buckets.items() if now - state[1] < full_after
+        }
+
+
+class AdmissionController:
+    """Bounded concurrency with a priority wait queue, run on the event loop.
+
+    A client over its token-bucket rate is refused with 429. Otherwise the
+    request either gets a slot, waits in the queue (critical before
+    interactive before batch, FIFO within a class), or is rejected up front
+    when its estimated wait would exceed its deadline. A full queue sheds its
+    lowest-priority waiter in favour of a more important newcomer.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_wait_seconds: float = ADMISSION_MAX_WAIT_SECONDS,
+        limiter: TokenBucketLimiter | None = None,
+    ) -> None:
+        self.limiter = limiter or TokenBucketLimiter(ADMISSION_RATE_PER_MINUTE, ADMISSION_BURST)
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.in_flight = 0
+        self._queue: list[list[Any]] = []
+        self._sequence = itertools.count()
+        self._service_seconds = 5.0
+        self._waits: dict[str, deque] = {name: deque(maxlen=_WAIT_SAMPLES) for name in PRIORITIES}
+        self._counters: dict[str, int] = {}
+
+    # -- bookkeeping ---------------------------------------------------------
+
+    def _count(self, name: str) -> None:
+        self._counters[name] = self._counters.get(name, 0) + 1
+
+    def _queued(self) -> list[list[Any]]:
+        return [entry for entry in self._queue if not entry[3].done()]
+
+    def _estimated_wait(self, ahead: int) -> float:
+        # Each slot frees up roughly every service time; EWMA of recent handlers.
+        return (ahead // self.max_concurrent + 1) * self._service_seconds
+
+    def record_service_time(self, seconds: float) -> None:
+        self._service_seconds = 0.8 * self._service_seconds + 0.2 * seconds
+
+    # -- admission -----------------------------------------------------------
+
+    async def acquire(self, priority: str, client_id: str) -> float:
+        """Wait for a slot; return the seconds spent queued or raise AdmissionRejected."""
+        retry_after = self.limiter.try_acquire(client_id)
+        if retry_after:
+            self._count(f"rate_limited_{priority}")
+            raise AdmissionRejected(429, "Client request rate limit exceeded.", retry_after)
+
+        rank = PRIORITIES[priority]
+        if self.in_flight < self.max_concurrent and not self._queued():
+            self.in_flight += 1
+            self._record_admit(priority, 0.0)
+            return 0.0
+
+        queued = self._queued()
+        ahead = sum(1 for entry in queued if entry[0] <= rank)
+        estimate = self._estimated_wait(ahead)
+        if estimate > self.max_wait_seconds:
+            self._count(f"rejected_deadline_{priority}")
+            raise AdmissionRejected(503, "Estimated queue wait exceeds the request deadline.", estimate)
+        if len(queued) >= self.max_queue:
+            victim = max(queued, key=lambda entry: (entry[0], entry[1]), default=None)
+            if victim is None or victim[0] <= rank:
+                self._count(f"rejected_queue_full_{priority}")
+                raise AdmissionRejected(503, "Analysis queue is full.", estimate)
+            victim[3].set_exception(
+                AdmissionRejected(503, "Shed in favour of a higher-priority request.", estimate)
+            )
+            self._count(f"shed_{victim[2]}")
+            logger.warning("Queued request shed | shed_priority=%s for_priority=%s", victim[2], priority)
+        if len(self._queue) > 2 * max(self.max_queue, 1):
+            # Drop entries for waiters that already left (timeouts, disconnects).
+            self._queue = self._queued()
+            heapq.heapify(self._queue)
+
+        loop = asyncio.get_running_loop()
+        entry = [rank, next(self._sequence), priority, loop.create_future()]
+        heapq.heappush(self._queue, entry)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(entry[3]), timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            if entry[3].done() and not entry[3].exception():
+                # The slot was handed over just as the deadline passed; keep it.
+                pass
+            else:
+                entry[3].cancel()
+                self._count(f"rejected_timeout_{priority}")
+                raise AdmissionRejected(
+                    503,
+                    "Timed out waiting in the analysis queue.",
+                    self._estimated_wait(len(self._queued())),
+                )
+        except asyncio.CancelledError:
+            # Client went away. If the slot was already handed to us, pass it on.
+            if entry[3].done() and not entry[3].cancelled() and entry[3].exception() is None:
+                self.release()
+            entry[3].cancel()
+            raise
+        waited = time.monotonic() - started
+        self._record_admit(priority, waited)
+        return waited
+
+    def release(self) -> None:
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            if not entry[3].done():
+                # Hand the slot straight to the next waiter; in_flight is unchanged.
+                entry[3].set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _record_admit(self, priority: str, waited: float) -> None:
+        self._count(f"admitted_{priority}")
+        self._waits[priority].append(waited)
+
+    # -- metrics -------------------------------------------------------------
+
+    def metrics(self) -> dict[str, Any]:
+        queued = self._queued()
+        waits: dict[str, dict[str, float]] = {}
+        for priority, samples in self._waits.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            waits[priority] = {
+                "samples": len(ordered),
+                "avg_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1),
+            }
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": len(queued),
+            "queue_depth_by_priority": {
+                priority: sum(1 for entry in queued if entry[2] == priority) for priority in PRIORITIES
+            },
+            "max_queue": self.max_queue,
+            "estimated_service_seconds": round(self._service_seconds, 3),
+            "wait_time": waits,
+            "counters": dict(sorted(self._counters.items())),
+        }
@@ -1,21 +1,89 @@
 import json
 import os
+import shutil
+import time
 import uuid
-from typing import Any
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, File, Header, HTTPException, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse
 from pydantic import BaseModel, Field
 
-from knowledge_service import save_knowledge_entry
+from admission import (
+    ADMISSION_CLIENT_HEADER,
+    ADMISSION_CRITICAL_CLIENTS,
+    ADMISSION_ENABLED,
+    AdmissionController,
+    AdmissionRejected,
+    classify_priority,
+)
+from bulk_import import ARCHIVE_SUFFIXES, IMPORT_UPLOAD_DIR, SUPPORTED_EXTENSIONS, enqueue_bulk_import
+from indexing_queue import get_job, start_index_worker, stop_index_worker
+from knowledge_service import enqueue_knowledge_entry
+from log_extractor import LogEvidenceExtractor, LogTooLargeError, MultipartLogUpload, format_evidence
 from logging_config import get_logger
-from query_rag import analyze_incident, follow_up_discussion
+from prompt_assembly import llm_usage_metrics
+from profiling import (
+    PROFILING_ENABLED,
+    TRACEMALLOC_ENABLED,
+    consume_profile_budget,
+    list_profiles,
+    memory_snapshot,
+    profile_file,
+    profiling_status,
+    request_profiles,
+    run_profiled,
+    start_memory_tracing,
+)
+from query_rag import (
+    UnknownShardError,
+    analyze_incident,
+    follow_up_discussion,
+    get_index_status,
+    reload_index,
+    start_index_watcher,
+    stop_index_watcher,
+)
+
+logger = get_logger(__name__)
+
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "").strip()
+INDEX_WATCH_ENABLED = os.getenv("INDEX_WATCH_ENABLED", "true").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+INDEX_JOB_WORKER_ENABLED = os.getenv("INDEX_JOB_WORKER_ENABLED", "true").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+LOG_UPLOAD_MAX_BYTES = int(float(os.getenv("LOG_UPLOAD_MAX_MB", "2048")) * 1024 * 1024)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    if TRACEMALLOC_ENABLED:
+        start_memory_tracing()
+    if INDEX_WATCH_ENABLED:
+        start_index_watcher()
+    if INDEX_JOB_WORKER_ENABLED:
+        start_index_worker()
+    yield
+    stop_index_worker()
+    stop_index_watcher()
+
 
 app = FastAPI(
     title="DevOps Incident Analyzer API",
     version="1.0.0",
+    lifespan=lifespan,
 )
-logger = get_logger(__name__)
 
 _origins_raw = os.getenv(
     "FRONTEND_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173"
@@ -40,6 +108,10 @@ class AnalyzeIncidentRequest(BaseModel):
     incident_text: str | None = Field(
         default=None, description="Backward-compatible combined incident input."
     )
+    severity: str | None = Field(
+        default=None,
+        description="Structured incident severity (e.g. SEV1); critical values need a trusted caller.",
+    )
 
 
 class AnalyzeIncidentResponse(BaseModel):
@@ -47,6 +119,11 @@ class AnalyzeIncidentResponse(BaseModel):
     parsed_output: dict[str, Any] | None = None
 
 
+class AnalyzeLogsResponse(AnalyzeIncidentResponse):
+    evidence: str
+    log_stats: dict[str, Any]
+
+
 class SaveKnowledgeRequest(BaseModel):
     description: str | None = None
     log_line: str | None = None
@@ -55,11 +132,23 @@ class SaveKnowledgeRequest(BaseModel):
 
 
 class SaveKnowledgeResponse(BaseModel):
-    id: str
-    file_path: str
+    job_id: str
+    status: str
     message: str
 
 
+class JobStatusResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    attempts: int
+    queue_position: int | None = None
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    created_at: float
+    updated_at: float
+
+
 class FollowUpRequest(BaseModel):
     question: str = Field(..., min_length=1)
     description: str | None = None
@@ -74,6 +163,129 @@ class FollowUpResponse(BaseModel):
     answer: str
 
 
+class IndexReloadResponse(BaseModel):
+    reloaded: bool
+    version: str
+    published_version: str
+    documents: int
+    loaded_at: float
+    watcher_running: bool
+    shard_by: str = "none"
+    reloaded_shards: list[str] = []
+    shards: dict[str, dict[str, Any]] = {}
+
+
+def _require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    # Admin routes stay closed until a token is configured.
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled; set ADMIN_API_TOKEN.")
+    if x_admin_token != ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+def _profile_requested(
+    x_profile: str | None = Header(default=None),
+    x_admin_token: str | None = Header(default=None),
+) -> bool | None:
+    """The X-Profile header's answer, or None when it is absent (see _should_profile)."""
+    if not PROFILING_ENABLED:
+        return False
+    if (x_profile or "").strip().lower() in {"1", "true", "yes", "on"}:
+        # Profiles are written to disk, so the header needs the admin token.
+        return bool(ADMIN_API_TOKEN) and x_admin_token == ADMIN_API_TOKEN
+    return None
+
+
+def _should_profile(requested: bool | None) -> bool:
+    """Whether to sample this request: X-Profile header or a pending admin request.
+
+    Called once the request has been validated, so rejected requests do not
+    use up profiles requested through /admin/profiling.
+    """
+    if requested is not None:
+        return requested
+    return consume_profile_budget()
+
+
+_admission = AdmissionController()
+
+
+def _client_id(request: Request) -> str:
+    if ADMISSION_CLIENT_HEADER:
+        forwarded = request.headers.get(ADMISSION_CLIENT_HEADER, "").split(",")[0].strip()
+        if forwarded:
+            return forwarded
+    return request.client.host if request.client else "unknown"
+
+
+def _request_priority(request: Request, requested: str | None, severity: str | None) -> str:
+    """Critical priority is only honoured for the admin token or an allow-listed client."""
+    x_admin_token = request.headers.get("x-admin-token")
+    trusted = bool(ADMIN_API_TOKEN and x_admin_token == ADMIN_API_TOKEN) or (
+        _client_id(request) in ADMISSION_CRITICAL_CLIENTS
+    )
+    return classify_priority(requested, severity, trusted)
+
+
+@asynccontextmanager
+async def _admission_slot(request: Request, response: Response, priority: str) -> AsyncIterator[None]:
+    """Hold an analysis slot for the body of the ``async with``; rejections become HTTP errors."""
+    if not ADMISSION_ENABLED:
+        yield
+        return
+
+    client_id = _client_id(request)
+    try:
+        waited = await _admission.acquire(priority, client_id)
+    except AdmissionRejected as exc:
+        logger.warning(
+            "Request rejected by admission control | path=%s client=%s priority=%s status=%s reason=%s retry_after=%s",
+            request.url.path,
+            client_id,
+            priority,
+            exc.status_code,
+            exc.reason,
+            exc.retry_after,
+        )
+        raise HTTPException(
+            status_code=exc.status_code,
+            detail=exc.reason,
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+
+    response.headers["X-Queue-Wait-Ms"] = f"{waited * 1000:.0f}"
+    response.headers["X-Request-Priority"] = priority
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        _admission.record_service_time(time.monotonic() - started)
+        _admission.release()
+
+
+async def _admit(
+    request: Request,
+    response: Response,
+    x_request_priority: str | None = Header(default=None),
+) -> AsyncIterator[None]:
+    """Rate-limit, prioritise and queue analysis requests before they take a worker thread.
+
+    Runs on the event loop, so queued requests hold no threadpool worker.
+    """
+    if not ADMISSION_ENABLED:
+        yield
+        return
+
+    severity = None
+    if request.headers.get("content-type", "").startswith("application/json"):
+        # FastAPI has already read and cached the JSON body for the endpoint.
+        body = await request.json()
+        if isinstance(body, dict) and body.get("severity") is not None:
+            severity = str(body["severity"])
+    async with _admission_slot(request, response, _request_priority(request, x_request_priority, severity)):
+        yield
+
+
 def _compose_incident_text(payload: AnalyzeIncidentRequest) -> str:
     if payload.incident_text and payload.incident_text.strip():
         return payload.incident_text.strip()
@@ -102,14 +314,26 @@ def _compose_incident_text_followup(payload: FollowUpRequest) -> str:
     return "\n\n".join(parts).strip()
 
 
+def _parse_analysis(result: str) -> dict[str, Any] | None:
+    try:
+        parsed_candidate = json.loads(result)
+    except Exception:
+        return None
+    return parsed_candidate if isinstance(parsed_candidate, dict) else None
+
+
 @app.get("/health")
 def health() -> dict[str, str]:
     logger.info("Health check requested")
     return {"status": "ok"}
 
 
-@app.post("/analyze", response_model=AnalyzeIncidentResponse)
-def analyze(payload: AnalyzeIncidentRequest) -> AnalyzeIncidentResponse:
+@app.post("/analyze", response_model=AnalyzeIncidentResponse, dependencies=[Depends(_admit)])
+def analyze(
+    payload: AnalyzeIncidentRequest,
+    response: Response,
+    profile_requested: bool | None = Depends(_profile_requested),
+) -> AnalyzeIncidentResponse:
     trace_id = str(uuid.uuid4())
     incident_text = _compose_incident_text(payload)
     if not incident_text:
@@ -117,6 +341,7 @@ def analyze(payload: AnalyzeIncidentRequest) -> AnalyzeIncidentResponse:
             status_code=400,
             detail="Provide at least one of: incident_text, description, log_line.",
         )
+    profile = _should_profile(profile_requested)
 
     logger.info(
         "Analyze API request received | trace_id=%s incident_len=%s",
@@ -124,29 +349,122 @@ def analyze(payload: AnalyzeIncidentRequest) -> AnalyzeIncidentResponse:
         len(incident_text),
     )
     try:
-        result = analyze_incident(incident_text, trace_id=trace_id)
+        result = run_profiled(profile, trace_id, "analyze", analyze_incident, incident_text, trace_id=trace_id)
     except Exception as exc:
         logger.exception("Analyze API failed | trace_id=%s", trace_id)
         raise HTTPException(status_code=500, detail=f"Analysis failed: {exc}") from exc
 
-    parsed: dict[str, Any] | None = None
-    try:
-        parsed_candidate = json.loads(result)
-        if isinstance(parsed_candidate, dict):
-            parsed = parsed_candidate
-    except Exception:
-        parsed = None
-
+    parsed = _parse_analysis(result)
     logger.info(
         "Analyze API completed | trace_id=%s parsed=%s output_len=%s",
         trace_id,
         parsed is not None,
         len(result),
     )
+    if profile:
+        response.headers["X-Profile-Id"] = trace_id
     return AnalyzeIncidentResponse(raw_output=result, parsed_output=parsed)
 
 
-@app.post("/knowledge/save", response_model=SaveKnowledgeResponse)
+@app.post("/analyze/logs", response_model=AnalyzeLogsResponse)
+async def analyze_logs(
+    request: Request,
+    response: Response,
+    description: str | None = None,
+    severity: str | None = None,
+    profile_requested: bool | None = Depends(_profile_requested),
+    x_request_priority: str | None = Header(default=None),
+) -> AnalyzeLogsResponse:
+    """Analyze a plain or gzip log streamed as multipart ``file`` or as the raw body.
+
+    The body is never held in memory: each chunk goes through the evidence
+    extractor as it arrives, and only the extracted evidence reaches the LLM.
+    The admission slot is taken after extraction, so a slow upload holds none.
+    """
+    trace_id = str(uuid.uuid4())
+    started = time.perf_counter()
+    extractor = LogEvidenceExtractor()
+    content_type = request.headers.get("content-type", "")
+    upload: MultipartLogUpload | None = None
+    if content_type.startswith("multipart/form-data"):
+        try:
+            upload = MultipartLogUpload(content_type, extractor)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+    sink = upload.write if upload is not None else extractor.feed
+
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > LOG_UPLOAD_MAX_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Log upload exceeds {LOG_UPLOAD_MAX_BYTES // (1024 * 1024)} MB.",
+                )
+            # Parsing is CPU-bound; keep it off the event loop.
+            await run_in_threadpool(sink, chunk)
+        if upload is not None:
+            upload.finalize()
+        summary = await run_in_threadpool(extractor.finish)
+    except HTTPException:
+        raise
+    except LogTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except Exception as exc:
+        logger.warning("Log upload could not be read | trace_id=%s error=%s", trace_id, exc)
+        raise HTTPException(status_code=400, detail=f"Unreadable log upload: {exc}") from exc
+
+    if upload is not None and upload.filename is None:
+        raise HTTPException(status_code=400, detail="Multipart upload must include a file part.")
+    log_stats = {
+        key: summary[key]
+        for key in ("bytes_read", "compressed", "lines", "errors", "warnings", "first_timestamp", "last_timestamp")
+    }
+    log_stats["spikes"] = len(summary["spikes"])
+    log_stats["extract_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(
+        "Log upload extracted | trace_id=%s file=%s bytes=%s lines=%s errors=%s warnings=%s spikes=%s elapsed_ms=%s",
+        trace_id,
+        upload.filename if upload is not None else "<body>",
+        summary["bytes_read"],
+        summary["lines"],
+        summary["errors"],
+        summary["warnings"],
+        log_stats["spikes"],
+        log_stats["extract_ms"],
+    )
+    if not summary["errors"] and not summary["warnings"]:
+        raise HTTPException(
+            status_code=422,
+            detail="No error or warning lines, stack traces or spikes found in the uploaded log.",
+        )
+
+    evidence = format_evidence(summary)
+    if upload is not None:
+        description = description or upload.fields.get("description")
+    incident_text = _compose_incident_text(AnalyzeIncidentRequest(description=description, log_line=evidence))
+    async with _admission_slot(request, response, _request_priority(request, x_request_priority, severity)):
+        profile = _should_profile(profile_requested)
+        try:
+            result = await run_in_threadpool(
+                run_profiled, profile, trace_id, "analyze_logs", analyze_incident, incident_text, trace_id
+            )
+        except Exception as exc:
+            logger.exception("Log analysis failed | trace_id=%s", trace_id)
+            raise HTTPException(status_code=500, detail=f"Analysis failed: {exc}") from exc
+
+    if profile:
+        response.headers["X-Profile-Id"] = trace_id
+    return AnalyzeLogsResponse(
+        raw_output=result,
+        parsed_output=_parse_analysis(result),
+        evidence=evidence,
+        log_stats=log_stats,
+    )
+
+
+@app.post("/knowledge/save", response_model=SaveKnowledgeResponse, status_code=202)
 def save_knowledge(payload: SaveKnowledgeRequest) -> SaveKnowledgeResponse:
     if not (payload.description or payload.log_line or payload.parsed_output):
         raise HTTPException(
@@ -155,20 +473,77 @@ def save_knowledge(payload: SaveKnowledgeRequest) -> SaveKnowledgeResponse:
         )
 
     try:
-        result = save_knowledge_entry(payload.model_dump())
+        job = enqueue_knowledge_entry(payload.model_dump())
     except Exception as exc:
-        logger.exception("Knowledge save failed")
+        logger.exception("Knowledge save enqueue failed")
         raise HTTPException(status_code=500, detail=f"Knowledge save failed: {exc}") from exc
 
     return SaveKnowledgeResponse(
-        id=result["id"],
-        file_path=result["file_path"],
-        message="Knowledge saved and indexed successfully.",
+        job_id=job["id"],
+        status=job["status"],
+        message="Knowledge queued for indexing.",
+    )
+
+
+@app.post("/knowledge/import", response_model=SaveKnowledgeResponse, status_code=202)
+def import_knowledge(file: UploadFile = File(...), dry_run: bool = False) -> SaveKnowledgeResponse:
+    filename = (file.filename or "").lower()
+    suffix = next(
+        (
+            candidate
+            for candidate in (*ARCHIVE_SUFFIXES, *SUPPORTED_EXTENSIONS)
+            if filename.endswith(candidate)
+        ),
+        None,
+    )
+    if suffix is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Upload a .json, .jsonl, .csv file or a .zip/.tar/.tar.gz archive.",
+        )
+
+    os.makedirs(IMPORT_UPLOAD_DIR, exist_ok=True)
+    upload_path = os.path.join(IMPORT_UPLOAD_DIR, f"{uuid.uuid4().hex}{suffix}")
+    try:
+        with open(upload_path, "wb") as f:
+            shutil.copyfileobj(file.file, f)
+        job = enqueue_bulk_import(upload_path, dry_run=dry_run, cleanup=True)
+    except Exception as exc:
+        logger.exception("Knowledge import enqueue failed")
+        raise HTTPException(status_code=500, detail=f"Knowledge import failed: {exc}") from exc
+
+    logger.info("Knowledge import queued | job_id=%s file=%s", job["id"], file.filename)
+    return SaveKnowledgeResponse(
+        job_id=job["id"],
+        status=job["status"],
+        message="Import queued for indexing.",
     )
 
 
-@app.post("/followup", response_model=FollowUpResponse)
-def followup(payload: FollowUpRequest) -> FollowUpResponse:
+@app.get("/metrics/admission")
+async def admission_metrics() -> dict[str, Any]:
+    return _admission.metrics()
+
+
+@app.get("/metrics/llm")
+async def llm_metrics() -> dict[str, Any]:
+    return llm_usage_metrics()
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def job_status(job_id: str) -> JobStatusResponse:
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return JobStatusResponse(**job)
+
+
+@app.post("/followup", response_model=FollowUpResponse, dependencies=[Depends(_admit)])
+def followup(
+    payload: FollowUpRequest,
+    response: Response,
+    profile_requested: bool | None = Depends(_profile_requested),
+) -> FollowUpResponse:
     trace_id = str(uuid.uuid4())
     incident_text = _compose_incident_text_followup(payload)
     if not incident_text:
@@ -176,6 +551,7 @@ def followup(payload: FollowUpRequest) -> FollowUpResponse:
             status_code=400,
             detail="Provide incident context: incident_text or description/log_line.",
         )
+    profile = _should_profile(profile_requested)
 
     analysis_json = "{}"
     if payload.parsed_output:
@@ -192,7 +568,11 @@ def followup(payload: FollowUpRequest) -> FollowUpResponse:
         len(payload.question),
     )
     try:
-        answer = follow_up_discussion(
+        answer = run_profiled(
+            profile,
+            trace_id,
+            "followup",
+            follow_up_discussion,
             incident_text=incident_text,
             question=payload.question,
             analysis_json=analysis_json,
@@ -203,4 +583,61 @@ def followup(payload: FollowUpRequest) -> FollowUpResponse:
         logger.exception("Follow-up API failed | trace_id=%s", trace_id)
         raise HTTPException(status_code=500, detail=f"Follow-up failed: {exc}") from exc
 
+    if profile:
+        response.headers["X-Profile-Id"] = trace_id
     return FollowUpResponse(answer=answer)
+
+
+@app.post(
+    "/admin/index/reload",
+    response_model=IndexReloadResponse,
+    dependencies=[Depends(_require_admin)],
+)
+def admin_reload_index(force: bool = False, shard: str | None = None) -> IndexReloadResponse:
+    try:
+        result = reload_index(force=force, shard=shard)
+    except UnknownShardError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except Exception as exc:
+        logger.exception("Index reload failed")
+        raise HTTPException(status_code=500, detail=f"Index reload failed: {exc}") from exc
+    return IndexReloadResponse(**result)
+
+
+@app.post("/admin/profiling", dependencies=[Depends(_require_admin)])
+def admin_request_profiles(next_requests: int = 1) -> dict[str, Any]:
+    """Profile the next N analysis / follow-up requests (0 cancels)."""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=409, detail="Profiling is disabled (PROFILING_ENABLED=false).")
+    request_profiles(next_requests)
+    logger.info("Profiling requested | next_requests=%s", next_requests)
+    return profiling_status()
+
+
+@app.get("/admin/profiles", dependencies=[Depends(_require_admin)])
+def admin_list_profiles() -> dict[str, Any]:
+    return {**profiling_status(), "items": list_profiles()}
+
+
+@app.get("/admin/profiles/{trace_id}", dependencies=[Depends(_require_admin)])
+def admin_get_profile(trace_id: str, format: str = "speedscope") -> FileResponse:
+    path = profile_file(trace_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {trace_id} ({format})")
+    media_type = "application/json" if format == "speedscope" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
+
+
+@app.get("/admin/memory/snapshot", dependencies=[Depends(_require_admin)])
+def admin_memory_snapshot(limit: int = 20, group_by: str = "lineno", start: bool = False) -> dict[str, Any]:
+    """tracemalloc top allocators plus growth since the previous call."""
+    if group_by not in {"lineno", "filename"}:
+        raise HTTPException(status_code=400, detail="group_by must be lineno or filename.")
+    if start:
+        start_memory_tracing()
+    index_status = get_index_status()
+    return {
+        **memory_snapshot(limit=max(1, limit), group_by=group_by),
+        "index_documents": index_status["documents"],
+        "index_shards": {name: shard["documents"] for name, shard in index_status["shards"].items()},
+    }
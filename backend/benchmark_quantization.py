@@ -0,0 +1,148 @@
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from index_store import FAISS_INDEX_PATH, list_shards, read_current_version, shard_path, snapshot_path
+from vector_storage import (
+    FAISS_COARSE_OVERSAMPLE,
+    FAISS_RERANK_OVERSAMPLE,
+    build_coarse_index,
+    build_index,
+    exact_vectors,
+    load_full_vectors,
+    truncate_vectors,
+)
+
+# Compares exact float32 storage with float16 / int8 scalar quantization and
+# with a truncated-dimension coarse index: index memory, recall@k of the
+# approximate scan alone, and recall@k after the exact re-rank against the
+# full-precision vectors.
+
+
+def _load_shard_vectors(path: str) -> np.ndarray:
+    directory = snapshot_path(read_current_version(path), path)
+    vectors = load_full_vectors(directory)
+    if vectors is not None:
+        return np.asarray(vectors, dtype="float32")
+    index = faiss.read_index(f"{directory}/index.faiss")
+    vectors = exact_vectors(index)
+    if vectors is None:
+        raise ValueError(f"Index at {path} is quantized and has no full-precision store to benchmark against.")
+    return vectors
+
+
+def _load_corpus(index_path: str, shard: str | None = None) -> np.ndarray:
+    # All shards by default: together they are the corpus the API searches.
+    shards = [shard] if shard else list_shards(index_path)
+    if not shards:
+        raise FileNotFoundError(f"No index shards published under {index_path}.")
+    return np.concatenate([_load_shard_vectors(shard_path(index_path, name)) for name in shards])
+
+
+def _synthetic_corpus(count: int, dimension: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # Clustered data is closer to real embeddings than uniform noise.
+    centers = rng.standard_normal((max(1, count // 50), dimension)).astype("float32")
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.3 * rng.standard_normal((count, dimension)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _queries(corpus: np.ndarray, count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    picks = corpus[rng.integers(0, len(corpus), count)]
+    noisy = picks + 0.05 * rng.standard_normal(picks.shape).astype("float32")
+    return (noisy / np.linalg.norm(noisy, axis=1, keepdims=True)).astype("float32")
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row_found) & set(row_truth)) for row_found, row_truth in zip(found, truth))
+    return hits / truth.size
+
+
+def _rerank(
+    index: faiss.Index,
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    oversample: int = FAISS_RERANK_OVERSAMPLE,
+) -> np.ndarray:
+    _, candidates = index.search(queries, min(len(corpus), k * oversample))
+    results = []
+    for query, row in zip(queries, candidates):
+        row = row[row != -1]
+        distances = ((corpus[row] - query) ** 2).sum(axis=1)
+        results.append(row[np.argsort(distances)[:k]])
+    return np.array(results)
+
+
+def run(corpus: np.ndarray, query_count: int, k: int, seed: int, coarse_dimensions: int) -> None:
+    queries = _queries(corpus, query_count, seed)
+    exact = build_index(corpus, "float32")
+    _, truth = exact.search(queries, k)
+    baseline_bytes = faiss.serialize_index(exact).nbytes
+
+    print(f"corpus={len(corpus)} dim={corpus.shape[1]} queries={query_count} k={k} oversample={FAISS_RERANK_OVERSAMPLE}")
+    print(f"{'storage':<9} {'index_MB':>9} {'saved':>7} {'recall':>7} {'rerank':>7} {'scan_ms':>8} {'rerank_ms':>9}")
+    for storage in ("float32", "float16", "int8"):
+        index = exact if storage == "float32" else build_index(corpus, storage)
+        size = faiss.serialize_index(index).nbytes
+
+        started = time.perf_counter()
+        _, found = index.search(queries, k)
+        scan_ms = (time.perf_counter() - started) * 1000 / query_count
+
+        started = time.perf_counter()
+        reranked = _rerank(index, corpus, queries, k)
+        rerank_ms = (time.perf_counter() - started) * 1000 / query_count
+
+        print(
+            f"{storage:<9} {size / 1e6:>9.2f} {1 - size / baseline_bytes:>7.1%} "
+            f"{_recall(found, truth):>7.3f} {_recall(reranked, truth):>7.3f} "
+            f"{scan_ms:>8.3f} {rerank_ms:>9.3f}"
+        )
+
+    if 0 < coarse_dimensions < corpus.shape[1]:
+        coarse = build_coarse_index(corpus, coarse_dimensions)
+        coarse_queries = truncate_vectors(queries, coarse_dimensions)
+        size = faiss.serialize_index(coarse).nbytes
+
+        started = time.perf_counter()
+        _, found = coarse.search(coarse_queries, k)
+        scan_ms = (time.perf_counter() - started) * 1000 / query_count
+
+        started = time.perf_counter()
+        _, candidates = coarse.search(coarse_queries, min(len(corpus), k * FAISS_COARSE_OVERSAMPLE))
+        reranked = np.array(
+            [
+                row[np.argsort(((corpus[row] - query) ** 2).sum(axis=1))[:k]]
+                for query, row in zip(queries, candidates)
+            ]
+        )
+        rerank_ms = (time.perf_counter() - started) * 1000 / query_count
+        label = f"coarse{coarse_dimensions}"
+        print(
+            f"{label:<9} {size / 1e6:>9.2f} {1 - size / baseline_bytes:>7.1%} "
+            f"{_recall(found, truth):>7.3f} {_recall(reranked, truth):>7.3f} "
+            f"{scan_ms:>8.3f} {rerank_ms:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FAISS scalar quantization memory vs recall.")
+    parser.add_argument("--index-path", default=FAISS_INDEX_PATH, help="Index root to benchmark.")
+    parser.add_argument("--shard", help="Benchmark one shard instead of all of them.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic vectors instead of the index.")
+    parser.add_argument("--dimension", type=int, default=3072, help="Dimension for --synthetic.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--coarse-dimensions", type=int, default=256, help="Coarse index dimensions (0 to skip).")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        corpus = _synthetic_corpus(args.synthetic, args.dimension, args.seed)
+    else:
+        corpus = _load_corpus(args.index_path, args.shard)
+    run(corpus, args.queries, args.k, args.seed, args.coarse_dimensions)
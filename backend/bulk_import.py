@@ -0,0 +1,340 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from glob import glob
+from multiprocessing import get_context
+from typing import Any, Iterator
+
+from indexing_queue import enqueue_job, register_handler
+from knowledge_content import build_content, compute_content_hash, safe_list
+from logging_config import get_logger
+
+# ==========================
+# CONFIG
+# ==========================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMPORTED_DATA_DIR = os.path.join(BASE_DIR, "data", "IMPORTED INCIDENTS")
+IMPORT_UPLOAD_DIR = os.path.join(BASE_DIR, "imports")
+IMPORT_PARSE_WORKERS = int(os.getenv("IMPORT_PARSE_WORKERS", str(os.cpu_count() or 2)))
+IMPORT_EMBED_BATCH_SIZE = int(os.getenv("IMPORT_EMBED_BATCH_SIZE", "256"))
+IMPORT_EMBED_CONCURRENCY = int(os.getenv("IMPORT_EMBED_CONCURRENCY", "4"))
+# Postmortem exports can carry long free-text columns; the csv default is 128 KB.
+IMPORT_CSV_FIELD_LIMIT_BYTES = int(float(os.getenv("IMPORT_CSV_FIELD_LIMIT_MB", "16")) * 1024 * 1024)
+IMPORTED_ENTRY_HEADING = "Imported Incident Entry"
+BULK_IMPORT_JOB = "bulk_import"
+
+SUPPORTED_EXTENSIONS = {".json", ".jsonl", ".csv"}
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+LIST_FIELDS = (
+    "impacted_services",
+    "indicators_detected",
+    "resolution_steps",
+    "preventive_actions",
+)
+# Common export column names mapped onto the knowledge payload fields.
+FIELD_ALIASES = {
+    "description": ("description", "title", "summary", "short_description"),
+    "log_line": ("log_line", "logs", "log", "error", "error_message"),
+    "notes": ("notes", "comments", "work_notes"),
+    "executive_summary": ("executive_summary", "impact_summary"),
+    "root_cause": ("root_cause", "cause", "rca"),
+    "severity": ("severity", "priority", "sev"),
+    "impacted_services": ("impacted_services", "services", "service", "affected_services"),
+    "indicators_detected": ("indicators_detected", "indicators", "symptoms", "tags"),
+    "resolution_steps": ("resolution_steps", "resolution", "fix", "remediation"),
+    "preventive_actions": ("preventive_actions", "action_items", "follow_ups"),
+    "confidence_score": ("confidence_score",),
+}
+
+logger = get_logger(__name__)
+
+csv.field_size_limit(IMPORT_CSV_FIELD_LIMIT_BYTES)
+
+
+def _first_value(record: dict[str, Any], field: str) -> Any:
+    for alias in FIELD_ALIASES[field]:
+        value = record.get(alias)
+        if value not in (None, "", []):
+            return value
+    return None
+
+
+def _as_list(value: Any) -> list[str]:
+    if isinstance(value, list):
+        return safe_list(value)
+    if value is None:
+        return []
+    text = str(value)
+    for separator in ("\n", "|", ";", ","):
+        if separator in text:
+            return [part.strip() for part in text.split(separator) if part.strip()]
+    return [text.strip()] if text.strip() else []
+
+
+def normalize_record(record: dict[str, Any], source_file: str) -> dict[str, Any] | None:
+    """Turn one exported ticket/postmortem into an indexable document dict."""
+    if not isinstance(record, dict):
+        return None
+
+    record_id = str(record.get("id") or record.get("ticket_id") or record.get("number") or "").strip()
+    category = str(record.get("category") or record.get("type") or "incident").strip().lower()
+
+    if record.get("content"):
+        # Already in the data/ document format.
+        content = str(record["content"]).strip()
+        metadata = dict(record["metadata"]) if isinstance(record.get("metadata"), dict) else {}
+        payload_hash = compute_content_hash({"description": content})
+    else:
+        parsed = {
+            field: _first_value(record, field)
+            for field in FIELD_ALIASES
+            if field not in {"description", "log_line", "notes"}
+        }
+        parsed = {key: value for key, value in parsed.items() if value is not None}
+        for field in LIST_FIELDS:
+            if field in parsed:
+                parsed[field] = _as_list(parsed[field])
+        payload = {
+            "description": str(_first_value(record, "description") or ""),
+            "log_line": str(_first_value(record, "log_line") or ""),
+            "notes": str(_first_value(record, "notes") or ""),
+            "parsed_output": parsed,
+        }
+        if not (payload["description"] or payload["log_line"] or parsed):
+            return None
+        content = build_content(payload, heading=IMPORTED_ENTRY_HEADING)
+        metadata = {
+            "severity": parsed.get("severity", "unknown"),
+            "service": ", ".join(parsed.get("impacted_services", [])) or "unknown",
+            "tags": parsed.get("indicators_detected", []),
+        }
+        payload_hash = compute_content_hash(payload)
+
+    metadata.setdefault("category", category)
+    metadata.update(
+        {
+            "source": "bulk_import",
+            "imported_from": source_file,
+            "external_id": record_id or None,
+            "content_hash": payload_hash,
+        }
+    )
+    return {
+        # Ids derive from the content hash, so re-importing the same export is a no-op.
+        "id": f"DOC-IMP-{payload_hash[:12].upper()}",
+        "content": content,
+        "metadata": metadata,
+    }
+
+
+def _iter_records(file_path: str) -> Iterator[dict[str, Any]]:
+    extension = os.path.splitext(file_path)[1].lower()
+    with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+        if extension == ".csv":
+            yield from csv.DictReader(f)
+        elif extension == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            data = json.load(f)
+            if isinstance(data, dict) and isinstance(data.get("records"), list):
+                data = data["records"]
+            yield from data if isinstance(data, list) else [data]
+
+
+def parse_import_file(file_path: str) -> tuple[list[dict[str, Any]], int]:
+    """Parse one file into normalized documents; returns (documents, skipped)."""
+    documents: list[dict[str, Any]] = []
+    skipped = 0
+    source_file = os.path.basename(file_path)
+    try:
+        for record in _iter_records(file_path):
+            document = normalize_record(record, source_file)
+            if document is None:
+                skipped += 1
+            else:
+                documents.append(document)
+    except (OSError, ValueError, TypeError, csv.Error) as exc:
+        # One malformed export skips that file, never the whole import job.
+        logger.warning("Import file unreadable | path=%s error=%s", file_path, exc)
+        skipped += 1
+    return documents, skipped
+
+
+def _extract_archive(archive_path: str, target_dir: str) -> None:
+    if archive_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            archive.extractall(target_dir)
+        return
+    with tarfile.open(archive_path) as archive:
+        if hasattr(tarfile, "data_filter"):
+            archive.extractall(target_dir, filter="data")
+        else:
+            archive.extractall(target_dir)
+
+
+def _discover_files(root: str) -> list[str]:
+    return sorted(
+        path
+        for path in glob(os.path.join(root, "**", "*"), recursive=True)
+        if os.path.isfile(path) and os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
+    )
+
+
+def _existing_import_hashes() -> set[str]:
+    hashes: set[str] = set()
+    for file_path in glob(os.path.join(IMPORTED_DATA_DIR, "*.json")):
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        for doc in data if isinstance(data, list) else [data]:
+            content_hash = doc.get("metadata", {}).get("content_hash")
+            if content_hash:
+                hashes.add(content_hash)
+    return hashes
+
+
+def _embed_in_batches(contents: list[str]) -> list[list[float]]:
+    # Imported lazily so spawned parse workers never load the index.
+    from query_rag import embed_knowledge_texts
+
+    batches = [
+        contents[start:start + IMPORT_EMBED_BATCH_SIZE]
+        for start in range(0, len(contents), IMPORT_EMBED_BATCH_SIZE)
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, IMPORT_EMBED_CONCURRENCY)) as executor:
+        results = executor.map(embed_knowledge_texts, batches)
+        return [vector for batch in results for vector in batch]
+
+
+def import_incidents(source_path: str, dry_run: bool = False) -> dict[str, Any]:
+    """Import a directory or archive of exported incidents into data/ and the live index."""
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"Import source not found: {source_path}")
+
+    extract_dir = None
+    if os.path.isdir(source_path):
+        file_paths = _discover_files(source_path)
+    elif source_path.lower().endswith(ARCHIVE_SUFFIXES):
+        extract_dir = tempfile.mkdtemp(prefix="incident-import-")
+        _extract_archive(source_path, extract_dir)
+        file_paths = _discover_files(extract_dir)
+    else:
+        file_paths = [source_path]
+    logger.info("Bulk import started | source=%s files=%s", source_path, len(file_paths))
+
+    documents: list[dict[str, Any]] = []
+    skipped = 0
+    try:
+        # Imports run on the API's job worker thread; forking a threaded process can
+        # copy held locks into the children, so workers are always spawned.
+        with ProcessPoolExecutor(
+            max_workers=max(1, IMPORT_PARSE_WORKERS), mp_context=get_context("spawn")
+        ) as executor:
+            for file_documents, file_skipped in executor.map(parse_import_file, file_paths, chunksize=8):
+                documents.extend(file_documents)
+                skipped += file_skipped
+    finally:
+        if extract_dir:
+            shutil.rmtree(extract_dir, ignore_errors=True)
+
+    seen = _existing_import_hashes()
+    unique: list[dict[str, Any]] = []
+    for document in documents:
+        content_hash = document["metadata"]["content_hash"]
+        if content_hash in seen:
+            continue
+        seen.add(content_hash)
+        unique.append(document)
+
+    summary = {
+        "files": len(file_paths),
+        "records": len(documents) + skipped,
+        "skipped": skipped,
+        "duplicates": len(documents) - len(unique),
+        "imported": 0 if dry_run else len(unique),
+        "version": None,
+        "file_path": None,
+    }
+    if dry_run or not unique:
+        logger.info("Bulk import finished without indexing | dry_run=%s summary=%s", dry_run, summary)
+        return summary
+
+    from query_rag import add_knowledge_documents
+
+    vectors = _embed_in_batches([document["content"] for document in unique])
+    # One publish for the whole import: workers see all of it or none of it.
+    summary["version"] = add_knowledge_documents(
+        [
+            {
+                "content": document["content"],
+                "metadata": document["metadata"],
+                "source_id": document["id"],
+                "embedding": vector,
+            }
+            for document, vector in zip(unique, vectors)
+        ]
+    )
+
+    # Written after the publish so a failed publish leaves these records
+    # importable. If this write fails, the retry re-submits them and the index
+    # skips the DOC-IMP ids it already holds.
+    os.makedirs(IMPORTED_DATA_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    file_path = os.path.join(IMPORTED_DATA_DIR, f"IMPORT-{stamp}-{uuid.uuid4().hex[:6].upper()}.json")
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(unique, f, indent=2)
+    summary["file_path"] = file_path
+
+    logger.info("Bulk import completed | summary=%s", summary)
+    return summary
+
+
+def _discard_upload(payload: dict[str, Any]) -> None:
+    if payload.get("cleanup"):
+        try:
+            os.remove(payload["path"])
+        except OSError:
+            pass
+
+
+def _run_import_jobs(payloads: list[dict[str, Any]]) -> list[dict[str, Any] | Exception]:
+    outcomes: list[dict[str, Any] | Exception] = []
+    for payload in payloads:
+        try:
+            outcomes.append(import_incidents(payload["path"], dry_run=payload.get("dry_run", False)))
+        except Exception as exc:
+            outcomes.append(exc)
+            continue
+        _discard_upload(payload)
+    return outcomes
+
+
+def enqueue_bulk_import(path: str, dry_run: bool = False, cleanup: bool = False) -> dict[str, Any]:
+    return enqueue_job(BULK_IMPORT_JOB, {"path": path, "dry_run": dry_run, "cleanup": cleanup})
+
+
+# A failed job's upload is kept for its retries and removed after the last one.
+register_handler(BULK_IMPORT_JOB, _run_import_jobs, batch_size=1, on_failed=_discard_upload)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Bulk import exported incidents/postmortems (JSON, JSONL, CSV) into the knowledge index."
+    )
+    parser.add_argument("source", help="Directory, file or .zip/.tar.gz archive to import.")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and de-duplicate only; do not index.")
+    args = parser.parse_args()
+    print(json.dumps(import_incidents(args.source, dry_run=args.dry_run), indent=2))
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from html.parser import HTMLParser
+
+from langchain.docstore.document import Document
+from logging_config import get_logger
+
+# ==========================
+# CONFIG
+# ==========================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXTRACT_CACHE_DIR = os.path.join(BASE_DIR, ".extract_cache")
+# Same bundled cache model_config uses; chunking must not download encodings.
+os.environ.setdefault("TIKTOKEN_CACHE_DIR", os.path.join(BASE_DIR, "tiktoken_cache"))
+
+DOCUMENT_EXTENSIONS = {".pdf", ".md", ".markdown", ".html", ".htm"}
+DOC_CHUNK_TOKENS = int(os.getenv("DOC_CHUNK_TOKENS", "400"))
+DOC_CHUNK_OVERLAP_TOKENS = int(os.getenv("DOC_CHUNK_OVERLAP_TOKENS", "60"))
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(os.cpu_count() or 2)))
+# Bump when extraction logic changes so cached text is regenerated.
+EXTRACTOR_VERSION = "1"
+
+CATEGORY_BY_FOLDER = {
+    "RUNBOOK DOCUMENTS": "runbook",
+    "POSTMORTEM DOCUMENT": "postmortem",
+    "POSTMORTEM DOCUMENTS": "postmortem",
+    "INCIDENT DOCUMENTS": "incident",
+    "ERROR PATTERN LIBRARY": "pattern",
+    "LEARNED INCIDENTS": "learned_incident",
+    "IMPORTED INCIDENTS": "incident",
+}
+
+logger = get_logger(__name__)
+
+
+class _HTMLTextExtractor(HTMLParser):
+    _SKIP_TAGS = {"script", "style", "noscript", "head"}
+    _BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "pre", "section"}
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.parts: list[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def _extract_pdf(file_path: str) -> str:
+    try:
+        import fitz  # PyMuPDF
+
+        with fitz.open(file_path) as pdf:
+            return "\n".join(page.get_text() for page in pdf)
+    except ImportError:
+        from pypdf import PdfReader
+
+        return "\n".join(page.extract_text() or "" for page in PdfReader(file_path).pages)
+
+
+def _extract_html(file_path: str) -> str:
+    parser = _HTMLTextExtractor()
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        parser.feed(f.read())
+    return "".join(parser.parts)
+
+
+def _extract_markdown(file_path: str) -> str:
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    text = re.sub(r"!\[([^\]]*)\]\([^)]*\)", r"\1", text)
+    text = re.sub(r"\[([^\]]+)\]\([^)]*\)", r"\1", text)
+    text = re.sub(r"^\s{0,3}(#{1,6}|>|[-*+]\s+\[[ xX]\])\s*", "", text, flags=re.MULTILINE)
+    return text.replace("```", "")
+
+
+def _normalize_whitespace(text: str) -> str:
+    text = re.sub(r"[ \t\xa0]+", " ", text)
+    return re.sub(r"\n\s*\n+", "\n\n", text).strip()
+
+
+def extract_text(file_path: str) -> tuple[str, str | None, str | None]:
+    """Extract plain text from one file; runs inside parse worker processes."""
+    extension = os.path.splitext(file_path)[1].lower()
+    try:
+        if extension == ".pdf":
+            text = _extract_pdf(file_path)
+        elif extension in {".html", ".htm"}:
+            text = _extract_html(file_path)
+        else:
+            text = _extract_markdown(file_path)
+    except Exception as exc:
+        return file_path, None, str(exc)
+    return file_path, _normalize_whitespace(text), None
+
+
+def _file_hash(file_path: str) -> str:
+    digest = hashlib.sha256(EXTRACTOR_VERSION.encode("utf-8"))
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_path(file_hash: str) -> str:
+    return os.path.join(EXTRACT_CACHE_DIR, f"{file_hash}.json")
+
+
+def _read_cache(file_hash: str) -> str | None:
+    try:
+        with open(_cache_path(file_hash), "r", encoding="utf-8") as f:
+            return json.load(f)["text"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def _write_cache(file_hash: str, file_path: str, text: str) -> None:
+    os.makedirs(EXTRACT_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{_cache_path(file_hash)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.basename(file_path), "text": text}, f)
+    os.replace(tmp_path, _cache_path(file_hash))
+
+
+def chunk_text(text: str, chunk_tokens: int = DOC_CHUNK_TOKENS, overlap: int = DOC_CHUNK_OVERLAP_TOKENS) -> list[str]:
+    """Split text into windows of ``chunk_tokens`` tokens overlapping by ``overlap``."""
+    import tiktoken
+
+    encoding = tiktoken.get_encoding("cl100k_base")
+    tokens = encoding.encode(text)
+    if len(tokens) <= chunk_tokens:
+        return [text] if text.strip() else []
+
+    step = max(1, chunk_tokens - overlap)
+    chunks: list[str] = []
+    for start in range(0, len(tokens), step):
+        chunk = encoding.decode(tokens[start:start + chunk_tokens]).strip()
+        if chunk:
+            chunks.append(chunk)
+        if start + chunk_tokens >= len(tokens):
+            break
+    return chunks
+
+
+def category_for_path(file_path: str, data_path: str) -> str:
+    relative = os.path.relpath(file_path, data_path)
+    folder = relative.split(os.sep)[0] if os.sep in relative else ""
+    if folder.upper() in CATEGORY_BY_FOLDER:
+        return CATEGORY_BY_FOLDER[folder.upper()]
+    return re.sub(r"[^a-z0-9]+", "_", folder.lower()).strip("_") or "document"
+
+
+def load_file_documents(data_path: str) -> list[Document]:
+    """Load PDF/Markdown/HTML files under ``data_path`` as chunked Documents."""
+    file_paths = sorted(
+        path
+        for path in glob(os.path.join(data_path, "**", "*"), recursive=True)
+        if os.path.isfile(path) and os.path.splitext(path)[1].lower() in DOCUMENT_EXTENSIONS
+    )
+    if not file_paths:
+        return []
+
+    hashes = {path: _file_hash(path) for path in file_paths}
+    texts: dict[str, str] = {}
+    misses: list[str] = []
+    for path in file_paths:
+        cached = _read_cache(hashes[path])
+        if cached is None:
+            misses.append(path)
+        else:
+            texts[path] = cached
+    logger.info(
+        "Document files discovered | files=%s cached=%s to_parse=%s",
+        len(file_paths),
+        len(file_paths) - len(misses),
+        len(misses),
+    )
+
+    if misses:
+        with ProcessPoolExecutor(max_workers=max(1, min(INGEST_PARSE_WORKERS, len(misses)))) as executor:
+            for path, text, error in executor.map(extract_text, misses):
+                if error is not None:
+                    logger.warning("Document extraction failed | path=%s error=%s", path, error)
+                    continue
+                texts[path] = text
+                _write_cache(hashes[path], path, text)
+
+    documents: list[Document] = []
+    for path in file_paths:
+        text = texts.get(path)
+        if not text:
+            continue
+        chunks = chunk_text(text)
+        source_id = f"DOC-FILE-{hashes[path][:10].upper()}"
+        for index, chunk in enumerate(chunks):
+            documents.append(
+                Document(
+                    page_content=chunk,
+                    metadata={
+                        "category": category_for_path(path, data_path),
+                        "source": "document_file",
+                        "source_file": os.path.relpath(path, data_path),
+                        "source_id": source_id,
+                        "chunk": index,
+                        "chunks": len(chunks),
+                    },
+                )
+            )
+    logger.info("Document files chunked | files=%s chunks=%s", len(texts), len(documents))
+    return documents
@@ -0,0 +1,56 @@
+import hashlib
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9_\-\.]*")
+
+
+@lru_cache(maxsize=65536)
+def _hash_feature(feature: str, dimension: int) -> tuple[int, float]:
+    # blake2b rather than hash(): Python's string hash is randomised per process,
+    # and every worker must map a feature to the same bucket.
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dimension, 1.0 if (value >> 63) & 1 else -1.0
+
+
+class HashedTermEmbeddings(Embeddings):
+    """Local CPU embeddings: signed feature hashing of word unigrams and bigrams.
+
+    Term frequencies are log-scaled (there is no IDF weighting) and the vector
+    is L2-normalised, so distances stay comparable with the unit-norm Azure
+    embeddings used by the de-duplication thresholds. No model or network access is required; the
+    trade-off is lexical rather than semantic similarity.
+    """
+
+    backend_name = "local_hash"
+
+    def __init__(self, dimension: int = 1024) -> None:
+        self.dimension = dimension
+
+    def _features(self, text: str) -> Counter:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        features = Counter(tokens)
+        features.update(f"{left} {right}" for left, right in zip(tokens, tokens[1:]))
+        return features
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dimension, dtype="float32")
+        for feature, count in self._features(text).items():
+            index, sign = _hash_feature(feature, self.dimension)
+            vector[index] += sign * (1.0 + math.log(count))
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
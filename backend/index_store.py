@@ -0,0 +1,299 @@
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from logging_config import get_logger
+from vector_storage import (
+    FAISS_COARSE_DIMENSIONS,
+    FAISS_RERANK_STORE,
+    FAISS_VECTOR_STORAGE,
+    build_coarse_index,
+    build_index,
+    exact_vectors,
+    is_quantized,
+    save_coarse_index,
+    save_full_vectors,
+)
+
+# ==========================
+# CONFIG
+# ==========================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FAISS_INDEX_PATH = os.path.join(BASE_DIR, "faiss_index")
+VERSIONS_DIRNAME = "versions"
+CURRENT_FILENAME = "CURRENT"
+MANIFEST_FILENAME = "manifest.json"
+LOCK_FILENAME = ".write.lock"
+SHARDS_DIRNAME = "shards"
+# Shard name used when sharding is off: the index root itself.
+UNSHARDED = "all"
+
+# Backends whose vectors stay meaningful when truncated (Matryoshka-trained
+# text-embedding-3); hashed local features do not, so they get no coarse index.
+MATRYOSHKA_EMBEDDING_BACKENDS = {"azure"}
+
+INDEX_KEEP_VERSIONS = max(2, int(os.getenv("INDEX_KEEP_VERSIONS", "3")))
+INDEX_LOCK_TIMEOUT_SECONDS = float(os.getenv("INDEX_LOCK_TIMEOUT_SECONDS", "120"))
+INDEX_LOCK_STALE_SECONDS = float(os.getenv("INDEX_LOCK_STALE_SECONDS", "900"))
+# none keeps one index; category / service split documents into one index per
+# metadata value, each with its own snapshots, lock and reload cycle.
+FAISS_SHARD_BY = os.getenv("FAISS_SHARD_BY", "none").strip().lower()
+SHARD_BY_OPTIONS = {"none", "category", "service"}
+if FAISS_SHARD_BY not in SHARD_BY_OPTIONS:
+    raise ValueError(
+        f"Unsupported FAISS_SHARD_BY '{FAISS_SHARD_BY}'. "
+        f"Use one of: {', '.join(sorted(SHARD_BY_OPTIONS))}."
+    )
+
+logger = get_logger(__name__)
+
+
+def index_path_for_backend(backend: str) -> str:
+    """Each embedding backend keeps its own index; vectors are not interchangeable."""
+    if backend == "azure":
+        return FAISS_INDEX_PATH
+    return f"{FAISS_INDEX_PATH}_{backend}"
+
+
+def shard_name(metadata: dict[str, Any]) -> str:
+    """Shard a document belongs to, from its metadata."""
+    if FAISS_SHARD_BY == "none":
+        return UNSHARDED
+    value = str(metadata.get(FAISS_SHARD_BY) or "unknown").lower()
+    return re.sub(r"[^a-z0-9_\-]+", "_", value).strip("_") or "unknown"
+
+
+def shard_path(index_path: str, shard: str) -> str:
+    if shard == UNSHARDED:
+        return index_path
+    return os.path.join(index_path, SHARDS_DIRNAME, shard)
+
+
+def list_shards(index_path: str) -> list[str]:
+    """Shards with a published snapshot under ``index_path``."""
+    if FAISS_SHARD_BY == "none":
+        return [UNSHARDED]
+    shards_dir = os.path.join(index_path, SHARDS_DIRNAME)
+    try:
+        names = os.listdir(shards_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names if read_current_version(os.path.join(shards_dir, name)) is not None)
+
+
+def _new_version() -> str:
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    return f"{timestamp}-{uuid.uuid4().hex[:6]}"
+
+
+def _versions_dir(index_path: str) -> str:
+    return os.path.join(index_path, VERSIONS_DIRNAME)
+
+
+def read_current_version(index_path: str = FAISS_INDEX_PATH) -> str | None:
+    """Return the published snapshot version, or None for the legacy flat layout."""
+    try:
+        with open(os.path.join(index_path, CURRENT_FILENAME), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def snapshot_path(version: str | None, index_path: str = FAISS_INDEX_PATH) -> str:
+    if version is None:
+        return index_path
+    return os.path.join(_versions_dir(index_path), version)
+
+
+def read_manifest(version: str | None, index_path: str = FAISS_INDEX_PATH) -> dict[str, Any]:
+    manifest_path = os.path.join(snapshot_path(version, index_path), MANIFEST_FILENAME)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def load_snapshot(embeddings: Any, index_path: str = FAISS_INDEX_PATH) -> tuple[str | None, FAISS]:
+    version = read_current_version(index_path)
+    path = snapshot_path(version, index_path)
+    logger.info("Loading index snapshot | version=%s path=%s", version or "legacy", path)
+    vectorstore = FAISS.load_local(
+        path,
+        embeddings,
+        allow_dangerous_deserialization=True,
+    )
+    return version, vectorstore
+
+
+def _write_current(index_path: str, version: str) -> None:
+    current_path = os.path.join(index_path, CURRENT_FILENAME)
+    tmp_path = f"{current_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    # os.replace is atomic, so readers only ever see the old or the new version.
+    os.replace(tmp_path, current_path)
+
+
+def _prune_versions(index_path: str, keep_version: str) -> None:
+    versions_dir = _versions_dir(index_path)
+    versions = sorted(
+        name
+        for name in os.listdir(versions_dir)
+        if not name.startswith(".") and os.path.isdir(os.path.join(versions_dir, name))
+    )
+    stale = [name for name in versions[:-INDEX_KEEP_VERSIONS] if name != keep_version]
+    for name in stale:
+        shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+    if stale:
+        logger.info("Pruned index snapshots | removed=%s kept=%s", len(stale), INDEX_KEEP_VERSIONS)
+
+
+def coarse_dimensions_for_backend(backend: str) -> int:
+    """FAISS_COARSE_DIMENSIONS, or 0 for embedding backends that cannot be truncated."""
+    if FAISS_COARSE_DIMENSIONS > 0 and backend not in MATRYOSHKA_EMBEDDING_BACKENDS:
+        logger.warning(
+            "Coarse search ignored for embedding backend | backend=%s coarse_dimensions=%s",
+            backend,
+            FAISS_COARSE_DIMENSIONS,
+        )
+        return 0
+    return FAISS_COARSE_DIMENSIONS
+
+
+def publish_snapshot(
+    vectorstore: FAISS,
+    index_path: str = FAISS_INDEX_PATH,
+    manifest: dict[str, Any] | None = None,
+    full_vectors: np.ndarray | None = None,
+    coarse_index: Any = None,
+    coarse_dimensions: int = FAISS_COARSE_DIMENSIONS,
+    appended_vectors: np.ndarray | None = None,
+) -> str:
+    """Write the store as a new immutable version and point CURRENT at it.
+
+    An exact index is converted in place to the configured FAISS_VECTOR_STORAGE.
+    ``full_vectors`` (float32, index order) must be passed once the index is
+    already quantized, otherwise the snapshot has no re-rank store. Without
+    them, an up-to-date ``coarse_index`` is carried over instead of rebuilt.
+    ``appended_vectors`` are rows added after ``full_vectors`` (typically the
+    previous snapshot's memory-mapped store); the two are joined on disk.
+
+    Callers that read-modify-write the index must hold ``index_write_lock``.
+    """
+    version = _new_version()
+    versions_dir = _versions_dir(index_path)
+    os.makedirs(versions_dir, exist_ok=True)
+    staging_path = os.path.join(versions_dir, f".staging-{version}")
+
+    if full_vectors is None:
+        appended_vectors = None
+        full_vectors = exact_vectors(vectorstore.index)
+    elif appended_vectors is not None and not (is_quantized(vectorstore.index) and FAISS_RERANK_STORE):
+        # Only the re-rank store is extended on disk; anything else needs the rows in memory.
+        full_vectors = np.concatenate([full_vectors, appended_vectors])
+        appended_vectors = None
+    if FAISS_VECTOR_STORAGE != "float32" and full_vectors is not None and not is_quantized(vectorstore.index):
+        vectorstore.index = build_index(full_vectors, FAISS_VECTOR_STORAGE, vectorstore.index.metric_type)
+
+    vectorstore.save_local(staging_path)
+    quantized = is_quantized(vectorstore.index)
+    keep_full_vectors = quantized and FAISS_RERANK_STORE and full_vectors is not None
+    if keep_full_vectors:
+        save_full_vectors(staging_path, full_vectors, appended_vectors)
+    if not 0 < coarse_dimensions < vectorstore.index.d:
+        coarse_index = None
+    elif full_vectors is not None:
+        coarse_source = full_vectors
+        if appended_vectors is not None:
+            # Only the leading dimensions are needed, so only those are joined.
+            coarse_source = np.concatenate(
+                [
+                    np.asarray(full_vectors[:, :coarse_dimensions], dtype="float32"),
+                    np.asarray(appended_vectors, dtype="float32")[:, :coarse_dimensions],
+                ]
+            )
+        coarse_index = build_coarse_index(coarse_source, coarse_dimensions)
+    elif coarse_index is None or coarse_index.ntotal != vectorstore.index.ntotal:
+        logger.warning(
+            "Coarse index not published: no full-precision vectors | path=%s coarse_dimensions=%s",
+            index_path,
+            coarse_dimensions,
+        )
+        coarse_index = None
+    if coarse_index is not None:
+        save_coarse_index(staging_path, coarse_index)
+    coarse_dimensions = coarse_index.d if coarse_index is not None else 0
+    manifest_doc = {
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "documents": vectorstore.index.ntotal,
+        "vector_storage": FAISS_VECTOR_STORAGE if quantized else "float32",
+        "full_precision_store": keep_full_vectors,
+        "coarse_dimensions": coarse_dimensions,
+        **(manifest or {}),
+    }
+    with open(os.path.join(staging_path, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(manifest_doc, f, indent=2)
+
+    os.replace(staging_path, snapshot_path(version, index_path))
+    _write_current(index_path, version)
+    _prune_versions(index_path, keep_version=version)
+    logger.info(
+        "Index snapshot published | version=%s documents=%s",
+        version,
+        manifest_doc["documents"],
+    )
+    return version
+
+
+def _lock_is_stale(lock_path: str) -> bool:
+    try:
+        return time.time() - os.path.getmtime(lock_path) > INDEX_LOCK_STALE_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def index_write_lock(index_path: str = FAISS_INDEX_PATH) -> Iterator[None]:
+    """Cross-process lock serialising snapshot publishers (ingest, API workers)."""
+    os.makedirs(index_path, exist_ok=True)
+    lock_path = os.path.join(index_path, LOCK_FILENAME)
+    deadline = time.monotonic() + INDEX_LOCK_TIMEOUT_SECONDS
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if _lock_is_stale(lock_path):
+                logger.warning("Removing stale index lock | path=%s", lock_path)
+                try:
+                    os.remove(lock_path)
+                except FileNotFoundError:
+                    pass
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for index lock: {lock_path}")
+            time.sleep(0.05)
+
+    try:
+        os.write(fd, str(os.getpid()).encode("utf-8"))
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
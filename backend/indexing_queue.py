@@ -0,0 +1,321 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from threading import Event, Thread
+from typing import Any, Callable
+
+from logging_config import get_logger
+
+# ==========================
+# CONFIG
+# ==========================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_JOBS_DB_PATH = os.getenv("INDEX_JOBS_DB_PATH", "index_jobs.sqlite3")
+if not os.path.isabs(INDEX_JOBS_DB_PATH):
+    INDEX_JOBS_DB_PATH = os.path.join(BASE_DIR, INDEX_JOBS_DB_PATH)
+INDEX_JOB_BATCH_SIZE = int(os.getenv("INDEX_JOB_BATCH_SIZE", "16"))
+INDEX_JOB_MAX_ATTEMPTS = int(os.getenv("INDEX_JOB_MAX_ATTEMPTS", "5"))
+INDEX_JOB_POLL_SECONDS = float(os.getenv("INDEX_JOB_POLL_SECONDS", "1"))
+INDEX_JOB_RETRY_BASE_SECONDS = float(os.getenv("INDEX_JOB_RETRY_BASE_SECONDS", "2"))
+INDEX_JOB_STALE_SECONDS = float(os.getenv("INDEX_JOB_STALE_SECONDS", "600"))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+logger = get_logger(__name__)
+
+# A batch handler receives the payloads of claimed jobs and returns one result
+# per payload, in order: a JSON-serialisable dict on success or an Exception.
+BatchHandler = Callable[[list[dict[str, Any]]], list[dict[str, Any] | Exception]]
+FailureHandler = Callable[[dict[str, Any]], None]
+_HANDLERS: dict[str, tuple[BatchHandler, int, FailureHandler | None]] = {}
+_wakeup = Event()
+_worker_stop: Event | None = None
+_worker_thread: Thread | None = None
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(INDEX_JOBS_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _init_db() -> None:
+    with closing(_connect()) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                available_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (kind, status, available_at)"
+        )
+
+
+def register_handler(
+    kind: str,
+    handler: BatchHandler,
+    batch_size: int | None = None,
+    on_failed: FailureHandler | None = None,
+) -> None:
+    """``on_failed`` gets the payload of a job that failed its last attempt."""
+    _HANDLERS[kind] = (handler, batch_size or INDEX_JOB_BATCH_SIZE, on_failed)
+
+
+def enqueue_job(kind: str, payload: dict[str, Any]) -> dict[str, Any]:
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with closing(_connect()) as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at, available_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, STATUS_QUEUED, json.dumps(payload), now, now, now),
+        )
+    _wakeup.set()
+    logger.info("Job enqueued | job_id=%s kind=%s", job_id, kind)
+    return get_job(job_id) or {}
+
+
+def get_job(job_id: str) -> dict[str, Any] | None:
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        queue_position = None
+        if row["status"] == STATUS_QUEUED:
+            queue_position = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE kind = ? AND status = ? AND created_at < ?",
+                (row["kind"], STATUS_QUEUED, row["created_at"]),
+            ).fetchone()[0]
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "queue_position": queue_position,
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+def _claim_jobs(kind: str, limit: int) -> list[sqlite3.Row]:
+    now = time.time()
+    with closing(_connect()) as conn:
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent workers
+        # (other uvicorn processes) never claim the same job twice.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            handled = sorted(_HANDLERS)
+            kinds = ", ".join("?" * len(handled))
+            conn.execute(
+                f"UPDATE jobs SET status = ?, updated_at = ? "
+                f"WHERE status = ? AND updated_at < ? AND kind IN ({kinds})",
+                (STATUS_QUEUED, now, STATUS_RUNNING, now - INDEX_JOB_STALE_SECONDS, *handled),
+            )
+            # Jobs run outside the worker (mark_job_running / complete_job) have no
+            # heartbeat and are never retried: a stale one lost its process.
+            conn.execute(
+                f"UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                f"WHERE status IN (?, ?) AND updated_at < ? AND kind NOT IN ({kinds})",
+                (
+                    STATUS_FAILED,
+                    "Abandoned: no progress within INDEX_JOB_STALE_SECONDS.",
+                    now,
+                    STATUS_QUEUED,
+                    STATUS_RUNNING,
+                    now - INDEX_JOB_STALE_SECONDS,
+                    *handled,
+                ),
+            )
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND status = ? AND available_at <= ? "
+                "ORDER BY created_at LIMIT ?",
+                (kind, STATUS_QUEUED, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(STATUS_RUNNING, now, row["id"]) for row in rows],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return rows
+
+
+def _finish_job(job_id: str, attempts: int, outcome: dict[str, Any] | Exception) -> str:
+    now = time.time()
+    with closing(_connect()) as conn:
+        if not isinstance(outcome, Exception):
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, updated_at = ? WHERE id = ?",
+                (STATUS_SUCCEEDED, json.dumps(outcome), now, job_id),
+            )
+            return STATUS_SUCCEEDED
+
+        if attempts >= INDEX_JOB_MAX_ATTEMPTS:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (STATUS_FAILED, str(outcome), now, job_id),
+            )
+            logger.error("Job failed permanently | job_id=%s attempts=%s error=%s", job_id, attempts, outcome)
+            return STATUS_FAILED
+
+        delay = INDEX_JOB_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ?, available_at = ? WHERE id = ?",
+            (STATUS_QUEUED, str(outcome), now, now + delay, job_id),
+        )
+        logger.warning(
+            "Job failed, retry scheduled | job_id=%s attempts=%s retry_in_s=%.1f error=%s",
+            job_id,
+            attempts,
+            delay,
+            outcome,
+        )
+        return STATUS_QUEUED
+
+
+def mark_job_running(job_id: str) -> None:
+    """Claim a job that is executed outside the worker (no registered handler)."""
+    with closing(_connect()) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+            (STATUS_RUNNING, time.time(), job_id),
+        )
+
+
+def complete_job(job_id: str, outcome: dict[str, Any] | Exception) -> None:
+    """Record the final outcome of a job executed outside the worker; never retried."""
+    now = time.time()
+    with closing(_connect()) as conn:
+        if isinstance(outcome, Exception):
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (STATUS_FAILED, str(outcome), now, job_id),
+            )
+        else:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, updated_at = ? WHERE id = ?",
+                (STATUS_SUCCEEDED, json.dumps(outcome), now, job_id),
+            )
+
+
+def _heartbeat(job_ids: list[str], stop_event: Event) -> None:
+    # Keeps long-running jobs from being reclaimed as stale by other workers.
+    interval = max(1.0, INDEX_JOB_STALE_SECONDS / 3)
+    while not stop_event.wait(interval):
+        with closing(_connect()) as conn:
+            conn.executemany(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?",
+                [(time.time(), job_id, STATUS_RUNNING) for job_id in job_ids],
+            )
+
+
+def _run_batch(
+    kind: str,
+    handler: BatchHandler,
+    batch_size: int,
+    on_failed: FailureHandler | None = None,
+) -> int:
+    rows = _claim_jobs(kind, batch_size)
+    if not rows:
+        return 0
+
+    started = time.perf_counter()
+    payloads = [json.loads(row["payload"]) for row in rows]
+    heartbeat_stop = Event()
+    heartbeat = Thread(
+        target=_heartbeat,
+        args=([row["id"] for row in rows], heartbeat_stop),
+        name="index-job-heartbeat",
+        daemon=True,
+    )
+    heartbeat.start()
+    try:
+        outcomes = handler(payloads)
+    except Exception as exc:
+        logger.exception("Job batch failed | kind=%s jobs=%s", kind, len(rows))
+        outcomes = [exc] * len(rows)
+    finally:
+        heartbeat_stop.set()
+
+    for row, payload, outcome in zip(rows, payloads, outcomes):
+        status = _finish_job(row["id"], row["attempts"] + 1, outcome)
+        if status == STATUS_FAILED and on_failed is not None:
+            try:
+                on_failed(payload)
+            except Exception:
+                logger.exception("Job failure handler failed | job_id=%s kind=%s", row["id"], kind)
+    logger.info(
+        "Job batch processed | kind=%s jobs=%s failed=%s elapsed_ms=%.1f",
+        kind,
+        len(rows),
+        sum(isinstance(outcome, Exception) for outcome in outcomes),
+        (time.perf_counter() - started) * 1000,
+    )
+    return len(rows)
+
+
+def _worker_loop(stop_event: Event) -> None:
+    while not stop_event.is_set():
+        processed = 0
+        for kind, (handler, batch_size, on_failed) in list(_HANDLERS.items()):
+            try:
+                processed += _run_batch(kind, handler, batch_size, on_failed)
+            except Exception:
+                logger.exception("Job worker iteration failed | kind=%s", kind)
+        if processed:
+            continue
+        _wakeup.wait(INDEX_JOB_POLL_SECONDS)
+        _wakeup.clear()
+
+
+def start_index_worker() -> None:
+    global _worker_stop, _worker_thread
+    if _worker_thread is not None and _worker_thread.is_alive():
+        return
+    _init_db()
+    _worker_stop = Event()
+    _worker_thread = Thread(
+        target=_worker_loop,
+        args=(_worker_stop,),
+        name="index-job-worker",
+        daemon=True,
+    )
+    _worker_thread.start()
+    logger.info("Index job worker started | db=%s batch_size=%s", INDEX_JOBS_DB_PATH, INDEX_JOB_BATCH_SIZE)
+
+
+def stop_index_worker() -> None:
+    global _worker_thread
+    if _worker_stop is not None:
+        _worker_stop.set()
+        _wakeup.set()
+    if _worker_thread is not None:
+        _worker_thread.join(timeout=INDEX_JOB_POLL_SECONDS + 5)
+        _worker_thread = None
+        logger.info("Index job worker stopped")
+
+
+_init_db()
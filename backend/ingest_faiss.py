@@ -1,11 +1,23 @@
+import argparse
 import os
 import json
 from glob import glob
 
 from langchain.docstore.document import Document
 from langchain_community.vectorstores import FAISS
+from document_loader import load_file_documents
+from index_store import (
+    FAISS_SHARD_BY,
+    UNSHARDED,
+    coarse_dimensions_for_backend,
+    index_path_for_backend,
+    index_write_lock,
+    publish_snapshot,
+    shard_name,
+    shard_path,
+)
 from logging_config import get_logger
-from model_config import get_embeddings
+from model_config import EMBEDDING_BACKEND, get_embedding_backend_id, get_embeddings
 
 # ==========================
 # CONFIG
@@ -13,7 +25,8 @@ from model_config import get_embeddings
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, "data")
-FAISS_INDEX_PATH = os.path.join(BASE_DIR, "faiss_index")
+FAISS_INDEX_PATH = index_path_for_backend(EMBEDDING_BACKEND)
+EMBEDDING_BACKEND_ID = get_embedding_backend_id()
 
 # Azure config (set as env variables)
 # export AZURE_OPENAI_API_KEY=...
@@ -39,27 +52,31 @@ def load_documents():
         with open(file_path, "r", encoding="utf-8") as f:
             data = json.load(f)
 
-            if isinstance(data, list):
-                for item in data:
-                    documents.append(
-                        Document(
-                            page_content=item["content"],
-                            metadata=item.get("metadata", {})
-                        )
-                    )
-            else:
+            records = data if isinstance(data, list) else [data]
+            for item in records:
+                metadata = dict(item.get("metadata", {}))
+                if item.get("id"):
+                    metadata.setdefault("source_id", item["id"])
                 documents.append(
                     Document(
-                        page_content=data["content"],
-                        metadata=data.get("metadata", {})
+                        page_content=item["content"],
+                        metadata=metadata
                     )
                 )
 
+    documents.extend(load_file_documents(DATA_PATH))
     return documents
 
 
-def ingest():
-    logger.info("Ingestion started | data_path=%s index_path=%s", DATA_PATH, FAISS_INDEX_PATH)
+def ingest(shards: list[str] | None = None):
+    """Rebuild the index, or with FAISS_SHARD_BY set only the given shards."""
+    logger.info(
+        "Ingestion started | data_path=%s index_path=%s embedding_backend=%s shard_by=%s",
+        DATA_PATH,
+        FAISS_INDEX_PATH,
+        EMBEDDING_BACKEND_ID,
+        FAISS_SHARD_BY,
+    )
     docs = load_documents()
     logger.info("Documents loaded | count=%s", len(docs))
     if not docs:
@@ -68,11 +85,54 @@ def ingest():
             "Ensure files are valid JSON and present under the data directory."
         )
 
-    vectorstore = FAISS.from_documents(docs, embeddings)
-    vectorstore.save_local(FAISS_INDEX_PATH)
-
-    logger.info("FAISS index created successfully | path=%s", FAISS_INDEX_PATH)
+    grouped = {}
+    for doc in docs:
+        doc.metadata["embedding_backend"] = EMBEDDING_BACKEND_ID
+        grouped.setdefault(shard_name(doc.metadata), []).append(doc)
+    if shards:
+        unknown = sorted(set(shards) - set(grouped))
+        if unknown:
+            raise ValueError(
+                f"No documents for shard(s) {', '.join(unknown)}. "
+                f"Available: {', '.join(sorted(grouped))}."
+            )
+        grouped = {shard: grouped[shard] for shard in shards}
+
+    for shard, shard_docs in sorted(grouped.items()):
+        path = shard_path(FAISS_INDEX_PATH, shard)
+        vectorstore = FAISS.from_documents(shard_docs, embeddings)
+        manifest = {
+            "embedding_backend": EMBEDDING_BACKEND_ID,
+            "dimension": vectorstore.index.d,
+        }
+        if shard != UNSHARDED:
+            manifest.update(shard=shard, shard_by=FAISS_SHARD_BY)
+        # Running API workers pick up the new version through their index watcher.
+        with index_write_lock(path):
+            version = publish_snapshot(
+                vectorstore,
+                path,
+                manifest=manifest,
+                coarse_dimensions=coarse_dimensions_for_backend(EMBEDDING_BACKEND),
+            )
+
+        logger.info(
+            "FAISS index created successfully | path=%s shard=%s documents=%s version=%s",
+            path,
+            shard,
+            len(shard_docs),
+            version,
+        )
 
 
 if __name__ == "__main__":
-    ingest()
+    parser = argparse.ArgumentParser(description="Embed the data directory into the FAISS index.")
+    parser.add_argument(
+        "--shard",
+        action="append",
+        help="Rebuild only this shard (repeatable; requires FAISS_SHARD_BY).",
+    )
+    args = parser.parse_args()
+    if args.shard and FAISS_SHARD_BY == "none":
+        parser.error("--shard requires FAISS_SHARD_BY=category or service.")
+    ingest(args.shard)
@@ -0,0 +1,42 @@
+import hashlib
+import re
+from typing import Any
+
+LEARNED_ENTRY_HEADING = "Learned Incident Entry"
+
+
+def safe_list(value: Any) -> list[str]:
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return []
+
+
+def build_content(payload: dict[str, Any], heading: str = LEARNED_ENTRY_HEADING) -> str:
+    description = (payload.get("description") or "").strip()
+    log_line = (payload.get("log_line") or "").strip()
+    parsed = payload.get("parsed_output") or {}
+    notes = (payload.get("notes") or "").strip()
+
+    lines = [
+        heading,
+        f"Description: {description or 'unknown'}",
+        f"Logs: {log_line or 'unknown'}",
+        f"Executive Summary: {parsed.get('executive_summary', 'unknown')}",
+        f"Root Cause: {parsed.get('root_cause', 'unknown')}",
+        f"Severity: {parsed.get('severity', 'unknown')}",
+        f"Impacted Services: {', '.join(safe_list(parsed.get('impacted_services')))}",
+        f"Indicators Detected: {', '.join(safe_list(parsed.get('indicators_detected')))}",
+        f"Resolution Steps: {' | '.join(safe_list(parsed.get('resolution_steps')))}",
+        f"Preventive Actions: {' | '.join(safe_list(parsed.get('preventive_actions')))}",
+        f"Confidence Score: {parsed.get('confidence_score', 'unknown')}",
+    ]
+    if notes:
+        lines.append(f"Operator Notes: {notes}")
+    return "\n".join(lines)
+
+
+def compute_content_hash(payload: dict[str, Any]) -> str:
+    # Notes are merged rather than compared, so they are left out of the hash.
+    base_content = build_content({**payload, "notes": None})
+    normalized = re.sub(r"\s+", " ", base_content).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
@@ -2,72 +2,263 @@ import json
 import os
 import uuid
 from datetime import datetime, timezone
+from glob import glob
 from typing import Any
 
+import numpy as np
+
+from indexing_queue import enqueue_job, register_handler
+from knowledge_content import build_content, compute_content_hash, safe_list
 from logging_config import get_logger
-from query_rag import add_knowledge_document
+from query_rag import (
+    add_knowledge_documents,
+    embed_knowledge_texts,
+    find_similar_knowledge,
+    update_knowledge_document,
+)
 
 logger = get_logger(__name__)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LEARNED_DATA_DIR = os.path.join(BASE_DIR, "data", "LEARNED INCIDENTS")
+# Squared L2 between unit-norm embeddings (2 - 2*cosine); 0.1 ~= cosine 0.95.
+KNOWLEDGE_DEDUP_MAX_DISTANCE = float(os.getenv("KNOWLEDGE_DEDUP_MAX_DISTANCE", "0.1"))
+NOTES_PREFIX = "Operator Notes: "
+KNOWLEDGE_SAVE_JOB = "knowledge_save"
 
 
-def _safe_list(value: Any) -> list[str]:
-    if isinstance(value, list):
-        return [str(item).strip() for item in value if str(item).strip()]
-    return []
+def _learned_entry_path(doc_id: str) -> str:
+    return os.path.join(LEARNED_DATA_DIR, f"{doc_id}.json")
 
 
-def _build_content(payload: dict[str, Any]) -> str:
-    description = (payload.get("description") or "").strip()
-    log_line = (payload.get("log_line") or "").strip()
-    parsed = payload.get("parsed_output") or {}
-    notes = (payload.get("notes") or "").strip()
+def _load_learned_entry(doc_id: str) -> dict[str, Any] | None:
+    try:
+        with open(_learned_entry_path(doc_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _load_hash_index() -> dict[str, dict[str, Any]]:
+    hash_index: dict[str, dict[str, Any]] = {}
+    for file_path in glob(os.path.join(LEARNED_DATA_DIR, "*.json")):
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        content_hash = doc.get("metadata", {}).get("content_hash")
+        if content_hash:
+            hash_index[content_hash] = doc
+    return hash_index
+
+
+def _write_entry(doc: dict[str, Any]) -> str:
+    file_path = _learned_entry_path(doc["id"])
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    return file_path
+
+
+def _entry_result(doc: dict[str, Any], merged: bool) -> dict[str, Any]:
+    return {
+        "id": doc["id"],
+        "file_path": _learned_entry_path(doc["id"]),
+        "merged": merged,
+        "occurrence_count": int(doc["metadata"].get("occurrence_count", 1)),
+    }
 
-    lines = [
-        "Learned Incident Entry",
-        f"Description: {description or 'unknown'}",
-        f"Logs: {log_line or 'unknown'}",
-        f"Executive Summary: {parsed.get('executive_summary', 'unknown')}",
-        f"Root Cause: {parsed.get('root_cause', 'unknown')}",
-        f"Severity: {parsed.get('severity', 'unknown')}",
-        f"Impacted Services: {', '.join(_safe_list(parsed.get('impacted_services')))}",
-        f"Indicators Detected: {', '.join(_safe_list(parsed.get('indicators_detected')))}",
-        f"Resolution Steps: {' | '.join(_safe_list(parsed.get('resolution_steps')))}",
-        f"Preventive Actions: {' | '.join(_safe_list(parsed.get('preventive_actions')))}",
-        f"Confidence Score: {parsed.get('confidence_score', 'unknown')}",
-    ]
+
+def _find_near_duplicate(embedding: list[float]) -> dict[str, Any] | None:
+    for doc, distance in find_similar_knowledge(embedding, k=3):
+        if distance > KNOWLEDGE_DEDUP_MAX_DISTANCE:
+            break
+        source_id = doc.metadata.get("source_id")
+        existing = _load_learned_entry(source_id) if source_id else None
+        if existing:
+            logger.info(
+                "Near-duplicate knowledge found | id=%s distance=%.4f",
+                source_id,
+                distance,
+            )
+            return existing
+    return None
+
+
+def _merge_notes(content: str, notes: str) -> str:
+    lines = content.split("\n")
+    existing_notes = next((line for line in lines if line.startswith(NOTES_PREFIX)), None)
+    if existing_notes is None:
+        return f"{content}\n{NOTES_PREFIX}{notes}"
+    merged = [part.strip() for part in existing_notes[len(NOTES_PREFIX):].split(" | ")]
+    if notes in merged:
+        return content
+    merged.append(notes)
+    return "\n".join(
+        f"{NOTES_PREFIX}{' | '.join(merged)}" if line is existing_notes else line
+        for line in lines
+    )
+
+
+def _merge_payload(doc: dict[str, Any], payload: dict[str, Any], now: str) -> dict[str, Any]:
+    metadata = dict(doc.get("metadata", {}))
+    metadata["occurrence_count"] = int(metadata.get("occurrence_count", 1)) + 1
+    metadata["last_seen_at"] = now
+
+    content = doc["content"]
+    notes = (payload.get("notes") or "").strip()
     if notes:
-        lines.append(f"Operator Notes: {notes}")
-    return "\n".join(lines)
+        content = _merge_notes(content, notes)
+    return {**doc, "content": content, "metadata": metadata}
 
 
-def save_knowledge_entry(payload: dict[str, Any]) -> dict[str, Any]:
-    os.makedirs(LEARNED_DATA_DIR, exist_ok=True)
-    doc_id = f"DOC-LEARN-{uuid.uuid4().hex[:8].upper()}"
-    now = datetime.now(timezone.utc).isoformat()
+def _merge_into_existing(existing: dict[str, Any], payload: dict[str, Any], now: str) -> dict[str, Any]:
+    merged = _merge_payload(existing, payload, now)
+    _write_entry(merged)
+    # occurrence_count / last_seen_at live in the JSON entry only; the index is
+    # republished just when new notes change the indexed content.
+    reindexed = merged["content"] != existing["content"]
+    if reindexed:
+        update_knowledge_document(
+            content=merged["content"],
+            metadata=merged["metadata"],
+            source_id=merged["id"],
+        )
+    logger.info(
+        "Knowledge entry merged | id=%s occurrences=%s reindexed=%s",
+        merged["id"],
+        merged["metadata"]["occurrence_count"],
+        reindexed,
+    )
+    return merged
+
 
+def _new_entry(payload: dict[str, Any], content: str, content_hash: str, now: str) -> dict[str, Any]:
     parsed = payload.get("parsed_output") or {}
-    content = _build_content(payload)
-    metadata = {
-        "category": "learned_incident",
-        "source": "ui_feedback",
-        "created_at": now,
-        "severity": parsed.get("severity", "unknown"),
-        "service": ", ".join(_safe_list(parsed.get("impacted_services"))) or "unknown",
-        "tags": _safe_list(parsed.get("indicators_detected")),
-    }
-    doc = {
-        "id": doc_id,
+    return {
+        "id": f"DOC-LEARN-{uuid.uuid4().hex[:8].upper()}",
         "content": content,
-        "metadata": metadata,
+        "metadata": {
+            "category": "learned_incident",
+            "source": "ui_feedback",
+            "created_at": now,
+            "severity": parsed.get("severity", "unknown"),
+            "service": ", ".join(safe_list(parsed.get("impacted_services"))) or "unknown",
+            "tags": safe_list(parsed.get("indicators_detected")),
+            "content_hash": content_hash,
+            "occurrence_count": 1,
+        },
     }
 
-    file_path = os.path.join(LEARNED_DATA_DIR, f"{doc_id}.json")
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(doc, f, indent=2)
 
-    add_knowledge_document(content=content, metadata=metadata, source_id=doc_id)
-    logger.info("Knowledge entry saved | id=%s path=%s", doc_id, file_path)
-    return {"id": doc_id, "file_path": file_path}
+def _find_pending_duplicate(
+    pending: list[dict[str, Any]],
+    content_hash: str,
+    embedding: list[float],
+) -> dict[str, Any] | None:
+    vector = np.asarray(embedding, dtype="float32")
+    for entry in pending:
+        if entry["doc"]["metadata"]["content_hash"] == content_hash:
+            return entry
+        distance = float(np.sum((entry["vector"] - vector) ** 2))
+        if distance <= KNOWLEDGE_DEDUP_MAX_DISTANCE:
+            return entry
+    return None
+
+
+def save_knowledge_entries(payloads: list[dict[str, Any]]) -> list[dict[str, Any] | Exception]:
+    """Save a batch of entries with one embedding call and one index commit.
+
+    Returns one outcome per payload, in order: a result dict or the Exception
+    that prevented that payload from being saved.
+    """
+    os.makedirs(LEARNED_DATA_DIR, exist_ok=True)
+    now = datetime.now(timezone.utc).isoformat()
+    contents = [build_content(payload) for payload in payloads]
+    hashes = [compute_content_hash(payload) for payload in payloads]
+    hash_index = _load_hash_index()
+
+    embed_positions = [pos for pos, content_hash in enumerate(hashes) if content_hash not in hash_index]
+    vectors = embed_knowledge_texts([contents[pos] for pos in embed_positions]) if embed_positions else []
+    embedding_by_position = dict(zip(embed_positions, vectors))
+
+    outcomes: list[dict[str, Any] | Exception | None] = [None] * len(payloads)
+    pending: list[dict[str, Any]] = []
+    for pos, payload in enumerate(payloads):
+        try:
+            existing = hash_index.get(hashes[pos])
+            if existing:
+                logger.info("Exact duplicate knowledge found | id=%s", existing["id"])
+                merged = _merge_into_existing(existing, payload, now)
+                hash_index[hashes[pos]] = merged
+                outcomes[pos] = _entry_result(merged, merged=True)
+                continue
+
+            embedding = embedding_by_position[pos]
+            batch_match = _find_pending_duplicate(pending, hashes[pos], embedding)
+            if batch_match:
+                batch_match["doc"] = _merge_payload(batch_match["doc"], payload, now)
+                batch_match["positions"].append(pos)
+                continue
+
+            existing = _find_near_duplicate(embedding)
+            if existing:
+                merged = _merge_into_existing(existing, payload, now)
+                outcomes[pos] = _entry_result(merged, merged=True)
+                continue
+
+            pending.append(
+                {
+                    "doc": _new_entry(payload, contents[pos], hashes[pos], now),
+                    "embedding": embedding,
+                    "vector": np.asarray(embedding, dtype="float32"),
+                    "positions": [pos],
+                }
+            )
+        except Exception as exc:
+            logger.exception("Knowledge entry failed | position=%s", pos)
+            outcomes[pos] = exc
+
+    if pending:
+        try:
+            # Files are written only after the index commit succeeds, so a
+            # retried save never finds an on-disk entry that was never indexed.
+            add_knowledge_documents(
+                [
+                    {
+                        "content": entry["doc"]["content"],
+                        "metadata": entry["doc"]["metadata"],
+                        "source_id": entry["doc"]["id"],
+                        "embedding": entry["embedding"],
+                    }
+                    for entry in pending
+                ]
+            )
+            for entry in pending:
+                file_path = _write_entry(entry["doc"])
+                logger.info("Knowledge entry saved | id=%s path=%s", entry["doc"]["id"], file_path)
+                first, *merged_positions = entry["positions"]
+                outcomes[first] = _entry_result(entry["doc"], merged=False)
+                for pos in merged_positions:
+                    outcomes[pos] = _entry_result(entry["doc"], merged=True)
+        except Exception as exc:
+            logger.exception("Knowledge batch commit failed | entries=%s", len(pending))
+            for entry in pending:
+                for pos in entry["positions"]:
+                    outcomes[pos] = exc
+
+    return outcomes
+
+
+def save_knowledge_entry(payload: dict[str, Any]) -> dict[str, Any]:
+    outcome = save_knowledge_entries([payload])[0]
+    if isinstance(outcome, Exception):
+        raise outcome
+    return outcome
+
+
+def enqueue_knowledge_entry(payload: dict[str, Any]) -> dict[str, Any]:
+    return enqueue_job(KNOWLEDGE_SAVE_JOB, payload)
+
+
+register_handler(KNOWLEDGE_SAVE_JOB, save_knowledge_entries)
@@ -0,0 +1,539 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import zlib
+from datetime import datetime, timedelta
+from typing import Any
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+# ==========================
+# CONFIG
+# ==========================
+
+LOG_MAX_LINE_BYTES = int(os.getenv("LOG_MAX_LINE_BYTES", "16384"))
+LOG_MAX_SIGNATURES = int(os.getenv("LOG_MAX_SIGNATURES", "500"))
+LOG_MAX_TRACES = int(os.getenv("LOG_MAX_TRACES", "50"))
+LOG_TRACE_MAX_LINES = int(os.getenv("LOG_TRACE_MAX_LINES", "30"))
+LOG_MAX_MINUTE_BUCKETS = int(os.getenv("LOG_MAX_MINUTE_BUCKETS", "20160"))
+LOG_SPIKE_MIN_ERRORS = int(os.getenv("LOG_SPIKE_MIN_ERRORS", "20"))
+LOG_EVIDENCE_MAX_CHARS = int(os.getenv("LOG_EVIDENCE_MAX_CHARS", "12000"))
+# Upload limits count compressed bytes; this caps what a gzip body may expand to.
+LOG_MAX_DECOMPRESSED_BYTES = int(float(os.getenv("LOG_MAX_DECOMPRESSED_MB", "20480")) * 1024 * 1024)
+DECOMPRESS_CHUNK_BYTES = 1024 * 1024
+SAMPLE_CHARS = 400
+SPIKE_SAMPLES_PER_MINUTE = 2
+
+_LEVEL_PATTERN = re.compile(
+    r"\b(fatal|critical|panic|severe|error|err|exception|traceback|warn|warning)\b",
+    re.IGNORECASE,
+)
+# Substrings that make a line worth a closer look. They are searched with
+# bytes.find over an ASCII-lowercased block, which is much faster than running
+# a case-insensitive regex over every line; candidates are then confirmed
+# against _LEVEL_PATTERN.
+_CANDIDATE_KEYWORDS = (b"err", b"fatal", b"critical", b"panic", b"severe", b"exception", b"traceback", b"warn", b"goroutine ")
+_WARN_LEVELS = {"warn", "warning"}
+# ISO 8601 / RFC 3339 prefixes, including `kubectl logs --timestamps`.
+_TIMESTAMP_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2})")
+_TRACE_START_PATTERN = re.compile(r"^(Traceback \(most recent call last\)|Exception in thread |goroutine \d+ \[)")
+# Java/JVM exception header, e.g. "java.lang.NullPointerException: ..." or
+# "java.lang.OutOfMemoryError: Java heap space". \bexception\b in _LEVEL_PATTERN
+# does not match inside CamelCase class names.
+_EXCEPTION_HEADER_PATTERN = re.compile(r"^(?:[A-Za-z_$][\w$]*\.)+[A-Za-z_$][\w$]*(?:Exception|Error)(?::|$)")
+_CONTINUATION_PATTERN = re.compile(r"^(\s+\S|Caused by:|\.\.\. \d+ more)")
+_VARIABLE_PATTERN = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|0x[0-9a-f]+|\b[0-9a-f]{12,}\b|\d+",
+    re.IGNORECASE,
+)
+_GZIP_MAGIC = b"\x1f\x8b"
+# Lines searched from each end of a block for its first / last timestamp; covers
+# a trailing stack trace or banner without reading every line of the block.
+_TIMESTAMP_SCAN_LINES = 200
+
+
+class LogTooLargeError(ValueError):
+    pass
+
+
+def _decode(line: bytes) -> str:
+    return line.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def _signature(line: str) -> str:
+    return _VARIABLE_PATTERN.sub("#", line.strip())[:SAMPLE_CHARS]
+
+
+class LogEvidenceExtractor:
+    """Single-pass, bounded-memory extraction of incident evidence from a log stream.
+
+    Feed raw bytes (plain or gzip, detected from the first bytes) with ``feed``
+    and call ``finish`` once. Only aggregates are kept: error/warn lines grouped
+    by a digit-insensitive signature, de-duplicated stack traces, and per-minute
+    error counts with a few sample lines for spike detection.
+    """
+
+    def __init__(self) -> None:
+        self._decompressor: Any = None
+        self._sniffed = b""
+        self._pending = b""
+        self._truncating = False
+        self.compressed = False
+        self.bytes_read = 0
+        self.decompressed_bytes = 0
+        self.lines = 0
+        self.level_counts = {"error": 0, "warn": 0}
+        self.signatures: dict[str, dict[str, Any]] = {}
+        self.other_signatures = {"error": 0, "warn": 0}
+        self.traces: dict[str, dict[str, Any]] = {}
+        self.other_traces = 0
+        self.minutes: dict[str, dict[str, Any]] = {}
+        self.first_timestamp: str | None = None
+        self.last_timestamp: str | None = None
+        self._trace: list[str] | None = None
+        self._trace_minute: str | None = None
+
+    # -- byte handling -------------------------------------------------------
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.bytes_read += len(chunk)
+        if self._decompressor is None and not self.compressed:
+            self._sniffed += chunk
+            if len(self._sniffed) < len(_GZIP_MAGIC):
+                return
+            chunk, self._sniffed = self._sniffed, b""
+            self.compressed = chunk.startswith(_GZIP_MAGIC)
+            if self.compressed:
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                self._decompressor = False
+        if self.compressed:
+            self._feed_compressed(chunk)
+        else:
+            self._feed_text(chunk)
+
+    def _feed_compressed(self, data: bytes) -> None:
+        # Inflate at most DECOMPRESS_CHUNK_BYTES at a time, so a highly compressible
+        # chunk never expands in memory all at once.
+        while True:
+            output = self._decompressor.decompress(data, DECOMPRESS_CHUNK_BYTES)
+            if output:
+                self.decompressed_bytes += len(output)
+                if self.decompressed_bytes > LOG_MAX_DECOMPRESSED_BYTES:
+                    raise LogTooLargeError(
+                        f"Decompressed log exceeds {LOG_MAX_DECOMPRESSED_BYTES // (1024 * 1024)} MB."
+                    )
+                self._feed_text(output)
+            if self._decompressor.eof:
+                # Concatenated gzip members (e.g. rotated logs joined with cat).
+                data = self._decompressor.unused_data
+                if not data:
+                    return
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                continue
+            data = self._decompressor.unconsumed_tail
+            if not data and len(output) < DECOMPRESS_CHUNK_BYTES:
+                return
+
+    def _feed_text(self, data: bytes) -> None:
+        last_newline = data.rfind(b"\n")
+        if last_newline == -1:
+            self._buffer_partial(data)
+            return
+        if self._truncating:
+            # The oversized line ends in this chunk; its kept head is in _pending.
+            self._truncating = False
+            first_newline = data.find(b"\n")
+            block = self._pending + data[first_newline:last_newline + 1]
+        else:
+            block = self._pending + data[:last_newline + 1]
+        self._pending = b""
+        self._buffer_partial(data[last_newline + 1:])
+        self._scan_block(block)
+
+    def _buffer_partial(self, piece: bytes) -> None:
+        if self._truncating:
+            return
+        self._pending += piece
+        if len(self._pending) > LOG_MAX_LINE_BYTES:
+            # Keep the head of an oversized line and drop the rest until "\n".
+            self._pending = self._pending[:LOG_MAX_LINE_BYTES]
+            self._truncating = True
+
+    def _scan_block(self, block: bytes) -> None:
+        """Process a run of complete lines (``block`` ends with a newline)."""
+        self.lines += block.count(b"\n")
+        # _minute_of records the time range; lines parsed below add to it too.
+        if self.first_timestamp is None:
+            position = 0
+            for _ in range(_TIMESTAMP_SCAN_LINES):
+                line_end = block.find(b"\n", position)
+                if line_end == -1 or self._minute_of(_decode(block[position:line_end])):
+                    break
+                position = line_end + 1
+        line_end = len(block) - 1
+        for _ in range(_TIMESTAMP_SCAN_LINES):
+            if line_end < 0:
+                break
+            position = block.rfind(b"\n", 0, line_end) + 1
+            if self._minute_of(_decode(block[position:line_end])):
+                break
+            line_end = position - 1
+
+        lowered = block.lower()
+        line_starts: set[int] = set()
+        for keyword in _CANDIDATE_KEYWORDS:
+            index = lowered.find(keyword)
+            while index != -1:
+                line_starts.add(lowered.rfind(b"\n", 0, index) + 1)
+                index = lowered.find(keyword, lowered.find(b"\n", index))
+        starts = sorted(line_starts)
+
+        position, next_start, end = 0, 0, len(block)
+        while position < end:
+            if self._trace is None:
+                # Outside a stack trace only candidate lines need a look.
+                while next_start < len(starts) and starts[next_start] < position:
+                    next_start += 1
+                if next_start == len(starts):
+                    return
+                position = starts[next_start]
+            line_end = block.find(b"\n", position)
+            self._process_line(_decode(block[position:line_end]))
+            position = line_end + 1
+
+    # -- line handling -------------------------------------------------------
+
+    def _process_line(self, line: str) -> None:
+        if self._trace is not None:
+            if _CONTINUATION_PATTERN.match(line):
+                if len(self._trace) < LOG_TRACE_MAX_LINES:
+                    self._trace.append(line)
+                if line.startswith("Caused by:"):
+                    self._count_level(line, "error", self._minute_of(line) or self._trace_minute)
+                return
+            if self._trace[0].startswith("Traceback") and line.strip():
+                # Python tracebacks end with an unindented "ErrorType: message".
+                self._trace.append(line)
+                self._close_trace()
+                self._count_level(line, "error", self._minute_of(line))
+                return
+            if _EXCEPTION_HEADER_PATTERN.match(line):
+                # The exception a logger prints on the line after "ERROR ... failed".
+                if len(self._trace) < LOG_TRACE_MAX_LINES:
+                    self._trace.append(line)
+                self._count_level(line, "error", self._minute_of(line) or self._trace_minute)
+                return
+            self._close_trace()
+
+        minute = self._minute_of(line)
+        if line.startswith("Traceback"):
+            # Counted once the closing "ErrorType: message" line arrives.
+            self._trace = [line]
+            self._trace_minute = minute
+            return
+        level_match = _LEVEL_PATTERN.search(line)
+        starts_trace = (
+            _TRACE_START_PATTERN.match(line) is not None or _EXCEPTION_HEADER_PATTERN.match(line) is not None
+        )
+        if level_match is None and not starts_trace:
+            return
+        level = "warn" if level_match and level_match.group(1).lower() in _WARN_LEVELS else "error"
+        self._count_level(line, level, minute)
+        if level == "error":
+            self._trace = [line]
+            self._trace_minute = minute
+
+    def _minute_of(self, line: str) -> str | None:
+        match = _TIMESTAMP_PATTERN.search(line, 0, 64)
+        if match is None:
+            return None
+        minute = f"{match.group(1)} {match.group(2)}"
+        if self.first_timestamp is None or minute < self.first_timestamp:
+            self.first_timestamp = minute
+        if self.last_timestamp is None or minute > self.last_timestamp:
+            self.last_timestamp = minute
+        return minute
+
+    def _count_level(self, line: str, level: str, minute: str | None) -> None:
+        self.level_counts[level] += 1
+        signature = _signature(line)
+        entry = self.signatures.get(signature)
+        if entry is None:
+            if len(self.signatures) >= LOG_MAX_SIGNATURES:
+                self.other_signatures[level] += 1
+            else:
+                self.signatures[signature] = {
+                    "level": level,
+                    "count": 1,
+                    "sample": line.strip()[:SAMPLE_CHARS],
+                    "first_seen": minute,
+                    "last_seen": minute,
+                }
+        else:
+            entry["count"] += 1
+            if minute:
+                entry["first_seen"] = entry["first_seen"] or minute
+                entry["last_seen"] = minute
+
+        if level == "error" and minute is not None:
+            bucket = self.minutes.get(minute)
+            if bucket is None:
+                if len(self.minutes) >= LOG_MAX_MINUTE_BUCKETS:
+                    return
+                bucket = self.minutes[minute] = {"errors": 0, "samples": []}
+            bucket["errors"] += 1
+            if len(bucket["samples"]) < SPIKE_SAMPLES_PER_MINUTE:
+                bucket["samples"].append(line.strip()[:SAMPLE_CHARS])
+
+    def _close_trace(self) -> None:
+        trace, self._trace = self._trace, None
+        if trace is None or len(trace) < 2:
+            return
+        key = _signature("\n".join(trace[:3]))
+        entry = self.traces.get(key)
+        if entry is not None:
+            entry["count"] += 1
+            entry["last_seen"] = self._trace_minute or entry["last_seen"]
+        elif len(self.traces) < LOG_MAX_TRACES:
+            self.traces[key] = {
+                "count": 1,
+                "lines": trace,
+                "first_seen": self._trace_minute,
+                "last_seen": self._trace_minute,
+            }
+        else:
+            self.other_traces += 1
+
+    # -- results -------------------------------------------------------------
+
+    def _spikes(self) -> list[dict[str, Any]]:
+        if len(self.minutes) < 3:
+            return []
+        counts = [bucket["errors"] for bucket in self.minutes.values()]
+        baseline = statistics.median(counts)
+        threshold = max(LOG_SPIKE_MIN_ERRORS, baseline + 3 * statistics.pstdev(counts))
+        hot = sorted(minute for minute, bucket in self.minutes.items() if bucket["errors"] >= threshold)
+
+        windows: list[dict[str, Any]] = []
+        for minute in hot:
+            at = datetime.strptime(minute, "%Y-%m-%d %H:%M")
+            if windows and at - windows[-1]["_end"] <= timedelta(minutes=1):
+                windows[-1]["_end"] = at
+                windows[-1]["minutes"].append(minute)
+            else:
+                windows.append({"_start": at, "_end": at, "minutes": [minute]})
+
+        spikes = []
+        for window in windows:
+            # Report one minute of context either side of the hot minutes.
+            start = window["_start"] - timedelta(minutes=1)
+            end = window["_end"] + timedelta(minutes=1)
+            covered = [
+                self.minutes[key]
+                for key in ((start + timedelta(minutes=offset)).strftime("%Y-%m-%d %H:%M")
+                            for offset in range(int((end - start).total_seconds() // 60) + 1))
+                if key in self.minutes
+            ]
+            spikes.append(
+                {
+                    "start": start.strftime("%Y-%m-%d %H:%M"),
+                    "end": end.strftime("%Y-%m-%d %H:%M"),
+                    "errors": sum(bucket["errors"] for bucket in covered),
+                    "peak_per_minute": max(self.minutes[minute]["errors"] for minute in window["minutes"]),
+                    "baseline_per_minute": baseline,
+                    "samples": [sample for minute in window["minutes"] for sample in self.minutes[minute]["samples"]][:6],
+                }
+            )
+        return sorted(spikes, key=lambda spike: spike["peak_per_minute"], reverse=True)
+
+    def finish(self) -> dict[str, Any]:
+        if self._sniffed:
+            sniffed, self._sniffed = self._sniffed, b""
+            self._decompressor = False
+            self._feed_text(sniffed)
+        if self._pending:
+            pending, self._pending = self._pending, b""
+            self._truncating = False
+            self._scan_block(pending + b"\n")
+        self._close_trace()
+
+        ranked = sorted(self.signatures.values(), key=lambda entry: entry["count"], reverse=True)
+        return {
+            "bytes_read": self.bytes_read,
+            "compressed": self.compressed,
+            "decompressed_bytes": self.decompressed_bytes,
+            "lines": self.lines,
+            "errors": self.level_counts["error"],
+            "warnings": self.level_counts["warn"],
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp,
+            "error_signatures": [entry for entry in ranked if entry["level"] == "error"],
+            "warning_signatures": [entry for entry in ranked if entry["level"] == "warn"],
+            "untracked_signatures": self.other_signatures,
+            "stack_traces": sorted(self.traces.values(), key=lambda entry: entry["count"], reverse=True),
+            "untracked_stack_traces": self.other_traces,
+            "spikes": self._spikes(),
+        }
+
+
+def _seen(entry: dict[str, Any]) -> str:
+    if not entry.get("first_seen"):
+        return ""
+    if entry["first_seen"] == entry["last_seen"]:
+        return f" at {entry['first_seen']}"
+    return f" {entry['first_seen']} .. {entry['last_seen']}"
+
+
+def format_evidence(summary: dict[str, Any], max_chars: int = LOG_EVIDENCE_MAX_CHARS) -> str:
+    """Render an extraction summary as compact incident text for analyze_incident."""
+    sections = [
+        (
+            f"Log scan: {summary['lines']} lines, {summary['errors']} error lines, "
+            f"{summary['warnings']} warning lines"
+            + (
+                f", {summary['first_timestamp']} .. {summary['last_timestamp']}"
+                if summary["first_timestamp"] and summary["last_timestamp"]
+                else ""
+            )
+        )
+    ]
+    if summary["spikes"]:
+        lines = ["Error spikes:"]
+        for spike in summary["spikes"][:3]:
+            lines.append(
+                f"- {spike['start']} .. {spike['end']}: {spike['errors']} errors, "
+                f"peak {spike['peak_per_minute']}/min vs baseline {spike['baseline_per_minute']:g}/min"
+            )
+            lines.extend(f"    {sample}" for sample in spike["samples"])
+        sections.append("\n".join(lines))
+    if summary["error_signatures"]:
+        sections.append(
+            "Top error lines:\n"
+            + "\n".join(f"- (x{entry['count']}{_seen(entry)}) {entry['sample']}" for entry in summary["error_signatures"][:15])
+        )
+    if summary["stack_traces"]:
+        sections.append(
+            "Stack traces:\n"
+            + "\n".join(
+                f"- (x{entry['count']}{_seen(entry)})\n" + "\n".join(f"    {line.strip()}" for line in entry["lines"][:12])
+                for entry in summary["stack_traces"][:5]
+            )
+        )
+    if summary["warning_signatures"]:
+        sections.append(
+            "Top warning lines:\n"
+            + "\n".join(f"- (x{entry['count']}) {entry['sample']}" for entry in summary["warning_signatures"][:5])
+        )
+
+    evidence = ""
+    for section in sections:
+        candidate = f"{evidence}\n\n{section}" if evidence else section
+        if len(candidate) > max_chars:
+            break
+        evidence = candidate
+    return evidence
+
+
+class MultipartLogUpload:
+    """Streams the first file part of a multipart/form-data body into an extractor.
+
+    Small form fields (e.g. ``description``) are collected; the file part is
+    never buffered.
+    """
+
+    MAX_FIELD_BYTES = 64 * 1024
+
+    def __init__(self, content_type: str, extractor: LogEvidenceExtractor) -> None:
+        _, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise ValueError("Missing boundary in multipart upload.")
+        self.extractor = extractor
+        self.fields: dict[str, str] = {}
+        self.filename: str | None = None
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._field_name: str | None = None
+        self._field_data = b""
+        self._is_file = False
+        self._parser = MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    def write(self, chunk: bytes) -> None:
+        self._parser.write(chunk)
+
+    def finalize(self) -> None:
+        self._parser.finalize()
+
+    def _on_part_begin(self) -> None:
+        self._disposition = b""
+        self._field_name = None
+        self._field_data = b""
+        self._is_file = False
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        if b"filename" in options:
+            # Only the first file part is analysed; later ones are skipped.
+            self._is_file = self.filename is None
+            if self._is_file:
+                self.filename = options[b"filename"].decode("utf-8", errors="replace")
+        else:
+            self._field_name = name
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._is_file:
+            self.extractor.feed(data[start:end])
+        elif self._field_name is not None and len(self._field_data) < self.MAX_FIELD_BYTES:
+            self._field_data += data[start:end]
+
+    def _on_part_end(self) -> None:
+        if self._field_name is not None:
+            self.fields[self._field_name] = self._field_data[: self.MAX_FIELD_BYTES].decode("utf-8", errors="replace")
+
+
+def extract_log_file(path: str, chunk_size: int = 1024 * 1024) -> dict[str, Any]:
+    extractor = LogEvidenceExtractor()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            extractor.feed(chunk)
+    return extractor.finish()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract incident evidence from a plain or gzip log file.")
+    parser.add_argument("path")
+    parser.add_argument("--json", action="store_true", help="Print the full extraction summary as JSON.")
+    args = parser.parse_args()
+
+    result = extract_log_file(args.path)
+    print(json.dumps(result, indent=2) if args.json else format_evidence(result))
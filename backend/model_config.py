@@ -14,6 +14,8 @@ if not os.path.exists(os.path.join(_TIKTOKEN_CACHE_DIR, _TIKTOKEN_REQUIRED_FILE)
     raise FileNotFoundError(
         f"tiktoken cache not found at {_TIKTOKEN_CACHE_DIR}\\{_TIKTOKEN_REQUIRED_FILE}"
     )
+from embedding_backends import HashedTermEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
 
 load_dotenv(os.path.join(_PROJECT_DIR, ".env"))
@@ -32,6 +34,10 @@ AZURE_OPENAI_EMBEDDING_MODEL = os.getenv(
 )
 AZURE_OPENAI_CA_BUNDLE = os.getenv("AZURE_OPENAI_CA_BUNDLE")
 AZURE_OPENAI_SSL_VERIFY = os.getenv("AZURE_OPENAI_SSL_VERIFY", "false")
+# "azure" (remote AzureOpenAIEmbeddings) or "local_hash" (CPU-only, no network).
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "azure").strip().lower()
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "1024"))
+EMBEDDING_BACKENDS = {"azure", "local_hash"}
 
 
 def _require_env(var_name: str, value: str | None) -> str:
@@ -64,7 +70,26 @@ def _get_http_client() -> httpx.Client:
 _HTTP_CLIENT = _get_http_client()
 
 
-def get_embeddings() -> AzureOpenAIEmbeddings:
+def get_embedding_backend_id() -> str:
+    """Identifier stored with every index snapshot and vector produced by the backend."""
+    if EMBEDDING_BACKEND == "local_hash":
+        return f"local_hash:{LOCAL_EMBEDDING_DIM}"
+    return f"azure:{AZURE_OPENAI_EMBEDDING_DEPLOYMENT or AZURE_OPENAI_EMBEDDING_MODEL}"
+
+
+def get_embeddings() -> Embeddings:
+    if EMBEDDING_BACKEND not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unsupported EMBEDDING_BACKEND '{EMBEDDING_BACKEND}'. "
+            f"Use one of: {', '.join(sorted(EMBEDDING_BACKENDS))}."
+        )
+    if EMBEDDING_BACKEND == "local_hash":
+        logger.info("Using local hashed embeddings | dimension=%s", LOCAL_EMBEDDING_DIM)
+        return HashedTermEmbeddings(dimension=LOCAL_EMBEDDING_DIM)
+    return _get_azure_embeddings()
+
+
+def _get_azure_embeddings() -> AzureOpenAIEmbeddings:
     endpoint = _require_env("AZURE_OPENAI_ENDPOINT", AZURE_OPENAI_ENDPOINT)
     api_key = _require_env("AZURE_OPENAI_API_KEY", AZURE_OPENAI_API_KEY)
 
@@ -0,0 +1,198 @@
+import json
+import os
+import re
+from glob import glob
+from typing import Any, Iterable
+
+from langchain.docstore.document import Document
+
+# Pattern documents are "Field: value" lines, see data/ERROR PATTERN LIBRARY.
+_FIELD_LINE = re.compile(
+    r"^\s*(pattern|meaning|likely root cause|recommended fix)\s*:\s*(.+?)\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_SIGNATURE_SEPARATOR = re.compile(r"[\s_\-]+")
+_STEP_SEPARATOR = re.compile(r"\s*(?:[;\n]|,\s+|(?<=\.)\s+)\s*")
+# A signature preceded by a negation within two words ("not seeing too many
+# connections") is not evidence for its pattern.
+_NEGATION = re.compile(
+    r"\b(?:not|no|never|without|isn't|aren't|wasn't|weren't|don't|doesn't|didn't|hasn't|haven't)"
+    r"(?:\W+\w+){0,2}\W*$",
+    re.IGNORECASE,
+)
+_NEGATION_WINDOW = 48
+SEVERITIES = {"low": "Low", "medium": "Medium", "high": "High", "critical": "Critical"}
+
+
+def load_library_signatures(library_path: str) -> dict[str, list[str]]:
+    """Signatures declared in the Error Pattern Library files, keyed by id and by lower-cased title.
+
+    Indexes built before an entry gained signatures only hold its title; these
+    fill in the rest until the index is rebuilt.
+    """
+    signatures: dict[str, list[str]] = {}
+    for file_path in sorted(glob(os.path.join(library_path, "*.json"))):
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for item in data if isinstance(data, list) else [data]:
+            declared = (item.get("metadata") or {}).get("signatures")
+            if not declared:
+                continue
+            fields = {name.lower(): value for name, value in _FIELD_LINE.findall(item.get("content", ""))}
+            for key in (item.get("id"), fields.get("pattern", "").lower()):
+                if key:
+                    signatures[key] = list(declared)
+    return signatures
+
+
+def parse_pattern_document(
+    doc: Document, library_signatures: dict[str, list[str]] | None = None
+) -> dict[str, Any] | None:
+    """Template fields of one Error Pattern Library document, or None if unparseable."""
+    fields = {name.lower(): value for name, value in _FIELD_LINE.findall(doc.page_content)}
+    title = fields.get("pattern")
+    if not title:
+        return None
+    metadata = doc.metadata or {}
+    declared = metadata.get("signatures")
+    if not declared and library_signatures:
+        declared = library_signatures.get(metadata.get("source_id")) or library_signatures.get(title.lower())
+    signatures = [title, *(declared or [])]
+    return {
+        "id": metadata.get("source_id") or title,
+        "title": title,
+        "meaning": fields.get("meaning", ""),
+        "root_cause": fields.get("likely root cause", "unknown"),
+        "fix": fields.get("recommended fix", ""),
+        "signatures": [str(signature).strip() for signature in signatures if str(signature).strip()],
+        "metadata": metadata,
+    }
+
+
+def parse_pattern_documents(
+    docs: Iterable[Document], library_signatures: dict[str, list[str]] | None = None
+) -> list[dict[str, Any]]:
+    parsed = (
+        parse_pattern_document(doc, library_signatures)
+        for doc in docs
+        if (doc.metadata or {}).get("category") == "pattern"
+    )
+    return [pattern for pattern in parsed if pattern is not None]
+
+
+def _signature_regex(signature: str) -> str:
+    # Case-insensitive, tolerant of spacing / "-" / "_" between words, and
+    # anchored on word boundaries so "503" does not fire inside "15030".
+    body = r"[\s_\-]+".join(re.escape(part) for part in _SIGNATURE_SEPARATOR.split(signature) if part)
+    prefix = r"\b" if signature[:1].isalnum() else ""
+    suffix = r"\b" if signature[-1:].isalnum() else ""
+    return f"{prefix}{body}{suffix}"
+
+
+class PatternMatcher:
+    """All pattern-library signatures compiled into one regex alternation.
+
+    Built once per index snapshot, so a request costs a single scan of the
+    incident text regardless of library size.
+    """
+
+    def __init__(self, patterns: Iterable[dict[str, Any]]) -> None:
+        self.patterns = list(patterns)
+        self._group_owner: dict[str, dict[str, Any]] = {}
+        self._group_signature: dict[str, str] = {}
+        alternatives: list[tuple[str, str]] = []
+        for pattern in self.patterns:
+            for signature in pattern["signatures"]:
+                group = f"s{len(self._group_owner)}"
+                self._group_owner[group] = pattern
+                self._group_signature[group] = signature.lower()
+                alternatives.append((signature, group))
+        # Longest first, so "HTTP 503 Service Unavailable" wins over a bare "503".
+        alternatives.sort(key=lambda item: len(item[0]), reverse=True)
+        self._regex = (
+            re.compile(
+                "|".join(f"(?P<{group}>{_signature_regex(signature)})" for signature, group in alternatives),
+                re.IGNORECASE,
+            )
+            if alternatives
+            else None
+        )
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Document]) -> "PatternMatcher":
+        return cls(parse_pattern_documents(docs))
+
+    def find(self, text: str) -> dict[str, dict[str, Any]]:
+        """Matched patterns keyed by id, with the signature texts that hit and their evidence.
+
+        ``distinct_signatures`` counts different library signatures (not repeats of
+        one), and ``coverage`` is the share of the text the matches span.
+        """
+        if self._regex is None:
+            return {}
+        found: dict[str, dict[str, Any]] = {}
+        length = max(1, len(text.strip()))
+        for match in self._regex.finditer(text):
+            if _NEGATION.search(text, max(0, match.start() - _NEGATION_WINDOW), match.start()):
+                continue
+            pattern = self._group_owner[match.lastgroup]
+            hit = found.setdefault(
+                pattern["id"],
+                {"pattern": pattern, "signatures": [], "_matched": set(), "coverage": 0.0},
+            )
+            if match.group(0) not in hit["signatures"]:
+                hit["signatures"].append(match.group(0))
+            hit["_matched"].add(self._group_signature[match.lastgroup])
+            hit["coverage"] += (match.end() - match.start()) / length
+        for hit in found.values():
+            hit["distinct_signatures"] = len(hit.pop("_matched"))
+            hit["coverage"] = round(min(1.0, hit["coverage"]), 3)
+        return found
+
+    def match(self, text: str, min_signatures: int = 2, min_coverage: float = 0.5) -> dict[str, Any] | None:
+        """The single pattern the text is clearly about, or None.
+
+        Exactly one pattern may match, and it needs ``min_signatures`` different
+        signatures or matches spanning ``min_coverage`` of the text; a lone
+        keyword inside a longer description is not enough.
+        """
+        found = self.find(text)
+        if len(found) != 1:
+            return None
+        hit = next(iter(found.values()))
+        if hit["distinct_signatures"] < min_signatures and hit["coverage"] < min_coverage:
+            return None
+        hit["confidence"] = evidence_confidence(hit)
+        return hit
+
+
+def evidence_confidence(hit: dict[str, Any]) -> float:
+    """0.5 for bare evidence, rising to 0.95 with more distinct signatures or coverage."""
+    strength = max(hit["coverage"], min(1.0, (hit["distinct_signatures"] - 1) / 3))
+    return round(0.5 + 0.45 * strength, 2)
+
+
+def _split_steps(text: str) -> list[str]:
+    return [step.strip().rstrip(".") for step in _STEP_SEPARATOR.split(text) if step.strip(" .")]
+
+
+def templated_analysis(hit: dict[str, Any], confidence: float | None = None) -> dict[str, Any]:
+    """Analysis in the INCIDENT_ANALYSIS_SYSTEM_PROMPT schema, filled from a pattern document."""
+    pattern = hit["pattern"]
+    metadata = pattern["metadata"]
+    summary = f"Matched known error pattern '{pattern['title']}'."
+    if pattern["meaning"]:
+        summary = f"{summary} {pattern['meaning']}"
+    service = metadata.get("service")
+    return {
+        "executive_summary": summary,
+        "root_cause": pattern["root_cause"],
+        "impacted_services": [service] if service else [],
+        "indicators_detected": hit["signatures"],
+        "severity": SEVERITIES.get(str(metadata.get("severity", "")).lower(), "Medium"),
+        "resolution_steps": metadata.get("resolution_steps") or _split_steps(pattern["fix"]),
+        "preventive_actions": metadata.get("preventive_actions") or [],
+        "confidence_score": evidence_confidence(hit) if confidence is None else confidence,
+        "analysis_source": "pattern_library",
+        "matched_pattern": pattern["id"],
+    }
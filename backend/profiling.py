@@ -0,0 +1,291 @@
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from threading import Event, Lock, Thread, get_ident
+from typing import Any, Callable
+
+from logging_config import get_logger
+
+# ==========================
+# CONFIG
+# ==========================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+PROFILE_SAMPLE_INTERVAL_MS = max(1.0, float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")))
+# Sampling stops after this long; the request itself carries on.
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_KEEP = max(1, int(os.getenv("PROFILE_KEEP", "200")))
+TRACEMALLOC_ENABLED = os.getenv("TRACEMALLOC_ENABLED", "false").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+TRACEMALLOC_FRAMES = max(1, int(os.getenv("TRACEMALLOC_FRAMES", "1")))
+
+PROFILE_FORMATS = {"speedscope": ".speedscope.json", "collapsed": ".collapsed.txt"}
+_PROFILE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+logger = get_logger(__name__)
+
+_budget_lock = Lock()
+_profile_budget = 0
+_snapshot_lock = Lock()
+_last_snapshot: tracemalloc.Snapshot | None = None
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack from a background thread.
+
+    Only the target thread's frames are walked, once per interval, so the
+    profiled request pays a brief GIL hand-off per sample and other requests
+    are unaffected. Stacks stop at ``root``, the frame that started profiling.
+    Work handed to other threads (e.g. the shard-search pool) is not sampled;
+    it shows up as time waiting on the futures.
+    """
+
+    def __init__(self, thread_id: int, root: Any, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS) -> None:
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval_ms / 1000
+        self.frames: list[dict[str, Any]] = []
+        self.samples: Counter = Counter()
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._frame_ids: dict[Any, int] = {}
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread = Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _frame_id(self, code: Any) -> int:
+        frame_id = self._frame_ids.get(code)
+        if frame_id is None:
+            frame_id = self._frame_ids[code] = len(self.frames)
+            self.frames.append(
+                {"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno}
+            )
+        return frame_id
+
+    def _run(self) -> None:
+        deadline = self.started + PROFILE_MAX_SECONDS
+        while not self._stop.wait(self.interval):
+            if time.perf_counter() > deadline:
+                logger.warning("Profiler sampling stopped at limit | max_seconds=%s", PROFILE_MAX_SECONDS)
+                return
+            frame = sys._current_frames().get(self.thread_id)
+            stack: list[int] = []
+            while frame is not None and frame is not self.root:
+                stack.append(self._frame_id(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.samples[tuple(stack)] += 1
+
+    def speedscope(self, name: str) -> dict[str, Any]:
+        interval_ms = self.interval * 1000
+        stacks = list(self.samples.items())
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "incident-analyzer-profiler",
+            "shared": {"frames": self.frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": round(self.elapsed * 1000, 3),
+                    "samples": [list(stack) for stack, _ in stacks],
+                    "weights": [count * interval_ms for _, count in stacks],
+                }
+            ],
+        }
+
+    def collapsed(self) -> str:
+        """Folded stacks, one "a;b;c count" line each, for flamegraph.pl and similar."""
+        labels = [
+            f"{frame['name']} ({os.path.basename(frame['file'])}:{frame['line']})" for frame in self.frames
+        ]
+        return "".join(
+            f"{';'.join(labels[i] for i in stack)} {count}\n"
+            for stack, count in sorted(self.samples.items())
+        )
+
+
+def request_profiles(count: int) -> int:
+    """Profile the next ``count`` analysis requests (0 cancels); returns the budget."""
+    global _profile_budget
+    with _budget_lock:
+        _profile_budget = max(0, count)
+        return _profile_budget
+
+
+def consume_profile_budget() -> bool:
+    global _profile_budget
+    with _budget_lock:
+        if _profile_budget <= 0:
+            return False
+        _profile_budget -= 1
+        return True
+
+
+def profiling_status() -> dict[str, Any]:
+    return {
+        "enabled": PROFILING_ENABLED,
+        "pending_requests": _profile_budget,
+        "sample_interval_ms": PROFILE_SAMPLE_INTERVAL_MS,
+        "output_dir": PROFILE_OUTPUT_DIR,
+        "profiles": len(list_profiles()),
+    }
+
+
+def _profile_path(profile_id: str, fmt: str) -> str:
+    return os.path.join(PROFILE_OUTPUT_DIR, f"{profile_id}{PROFILE_FORMATS[fmt]}")
+
+
+def _write_profile(profiler: SamplingProfiler, profile_id: str, label: str) -> None:
+    os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+    with open(_profile_path(profile_id, "speedscope"), "w", encoding="utf-8") as f:
+        json.dump(profiler.speedscope(f"{label} {profile_id}"), f)
+    with open(_profile_path(profile_id, "collapsed"), "w", encoding="utf-8") as f:
+        f.write(profiler.collapsed())
+    _prune_profiles()
+
+
+def _prune_profiles() -> None:
+    profiles = list_profiles()
+    for profile in profiles[PROFILE_KEEP:]:
+        for fmt in PROFILE_FORMATS:
+            try:
+                os.remove(_profile_path(profile["profile_id"], fmt))
+            except FileNotFoundError:
+                pass
+
+
+def run_profiled(
+    profile: bool,
+    trace_id: str,
+    label: str,
+    fn: Callable[..., Any],
+    /,
+    *args: Any,
+    **kwargs: Any,
+) -> Any:
+    """Call ``fn``; when ``profile`` is set, sample it and store the result under ``trace_id``."""
+    if not profile:
+        return fn(*args, **kwargs)
+
+    profiler = SamplingProfiler(get_ident(), sys._getframe())
+    profiler.start()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.stop()
+        try:
+            _write_profile(profiler, trace_id, label)
+        except OSError as exc:
+            logger.warning("Profile write failed | trace_id=%s error=%s", trace_id, exc)
+        else:
+            logger.info(
+                "Request profiled | trace_id=%s label=%s samples=%s elapsed_ms=%.1f",
+                trace_id,
+                label,
+                sum(profiler.samples.values()),
+                profiler.elapsed * 1000,
+            )
+
+
+def list_profiles() -> list[dict[str, Any]]:
+    """Stored profiles, newest first."""
+    suffix = PROFILE_FORMATS["speedscope"]
+    try:
+        names = [name for name in os.listdir(PROFILE_OUTPUT_DIR) if name.endswith(suffix)]
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        try:
+            created_at = os.path.getmtime(os.path.join(PROFILE_OUTPUT_DIR, name))
+        except FileNotFoundError:
+            continue
+        profiles.append({"profile_id": name[: -len(suffix)], "created_at": created_at})
+    return sorted(profiles, key=lambda profile: profile["created_at"], reverse=True)
+
+
+def profile_file(profile_id: str, fmt: str = "speedscope") -> str | None:
+    if fmt not in PROFILE_FORMATS or not _PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = _profile_path(profile_id, fmt)
+    return path if os.path.exists(path) else None
+
+
+def start_memory_tracing() -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        logger.info("Memory tracing started | frames=%s", TRACEMALLOC_FRAMES)
+
+
+def memory_snapshot(limit: int = 20, group_by: str = "lineno") -> dict[str, Any]:
+    """Top allocators now, and the biggest changes since the previous snapshot."""
+    global _last_snapshot
+    if not tracemalloc.is_tracing():
+        return {"tracing": False, "top": [], "growth": []}
+
+    with _snapshot_lock:
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            )
+        )
+        previous, _last_snapshot = _last_snapshot, snapshot
+    current, peak = tracemalloc.get_traced_memory()
+
+    def location(traceback: tracemalloc.Traceback) -> str:
+        frame = traceback[0]
+        return frame.filename if group_by == "filename" else f"{frame.filename}:{frame.lineno}"
+
+    top = [
+        {"location": location(stat.traceback), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+        for stat in snapshot.statistics(group_by)[:limit]
+    ]
+    growth = []
+    if previous is not None:
+        growth = [
+            {
+                "location": location(stat.traceback),
+                "size_kb": round(stat.size / 1024, 1),
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "count_diff": stat.count_diff,
+            }
+            for stat in snapshot.compare_to(previous, group_by)[:limit]
+        ]
+    return {
+        "tracing": True,
+        "traced_current_mb": round(current / 1024 / 1024, 2),
+        "traced_peak_mb": round(peak / 1024 / 1024, 2),
+        "top": top,
+        "growth": growth,
+    }
@@ -0,0 +1,134 @@
+import re
+from threading import Lock
+from typing import Any
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from logging_config import get_logger
+from prompts import (
+    FOLLOW_UP_DISCUSSION_SYSTEM_PROMPT,
+    FOLLOW_UP_DISCUSSION_USER_PROMPT,
+    INCIDENT_ANALYSIS_SYSTEM_PROMPT,
+    INCIDENT_ANALYSIS_USER_PROMPT,
+)
+
+# Built once: every request sends the very same system message, so Azure
+# OpenAI's automatic prompt caching can serve it (and any identical sections
+# that follow) from cache. Caching applies once the shared prefix reaches
+# 1024 tokens.
+_ANALYSIS_SYSTEM_MESSAGE = SystemMessage(content=INCIDENT_ANALYSIS_SYSTEM_PROMPT)
+_FOLLOW_UP_SYSTEM_MESSAGE = SystemMessage(content=FOLLOW_UP_DISCUSSION_SYSTEM_PROMPT)
+
+_BLOCKED_KEYWORDS = {
+    "symptoms": "indicators",
+    "Symptoms": "Indicators",
+}
+_BLOCKED_KEYWORD_PATTERN = re.compile("|".join(re.escape(keyword) for keyword in _BLOCKED_KEYWORDS))
+
+logger = get_logger(__name__)
+
+_usage_lock = Lock()
+_usage: dict[str, dict[str, float]] = {}
+
+
+def sanitize_blocked_keywords(text: str) -> str:
+    return _BLOCKED_KEYWORD_PATTERN.sub(lambda match: _BLOCKED_KEYWORDS[match.group(0)], text)
+
+
+def analysis_messages(context: str, question: str) -> list[BaseMessage]:
+    return [
+        _ANALYSIS_SYSTEM_MESSAGE,
+        HumanMessage(
+            content=INCIDENT_ANALYSIS_USER_PROMPT.format(
+                context=sanitize_blocked_keywords(context),
+                question=sanitize_blocked_keywords(question),
+            )
+        ),
+    ]
+
+
+def follow_up_messages(
+    incident_text: str,
+    analysis_json: str,
+    chat_history: str,
+    context: str,
+    question: str,
+) -> list[BaseMessage]:
+    return [
+        _FOLLOW_UP_SYSTEM_MESSAGE,
+        HumanMessage(
+            content=FOLLOW_UP_DISCUSSION_USER_PROMPT.format(
+                incident_text=sanitize_blocked_keywords(incident_text),
+                analysis_json=analysis_json,
+                chat_history=chat_history,
+                context=sanitize_blocked_keywords(context),
+                question=sanitize_blocked_keywords(question),
+            )
+        ),
+    ]
+
+
+def prompt_chars(messages: list[BaseMessage]) -> tuple[int, int]:
+    """Characters in the static system prefix and in the per-request remainder."""
+    static = len(messages[0].content)
+    return static, sum(len(message.content) for message in messages) - static
+
+
+def record_llm_usage(call: str, response: Any, elapsed_seconds: float, trace_id: str) -> dict[str, int]:
+    """Log cached vs. uncached prompt tokens from a chat response and add them to the totals."""
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    prompt_tokens = int(usage.get("prompt_tokens") or 0)
+    cached_tokens = int((usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0)
+    completion_tokens = int(usage.get("completion_tokens") or 0)
+    counts = {
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "uncached_tokens": prompt_tokens - cached_tokens,
+        "completion_tokens": completion_tokens,
+    }
+    with _usage_lock:
+        totals = _usage.setdefault(call, {})
+        hit = "cache_hit" if cached_tokens else "cache_miss"
+        for key, value in (
+            ("calls", 1),
+            ("calls_with_usage", 1 if usage else 0),
+            (f"{hit}_calls", 1),
+            (f"{hit}_seconds", elapsed_seconds),
+            *counts.items(),
+        ):
+            totals[key] = totals.get(key, 0) + value
+    logger.info(
+        "LLM usage | trace_id=%s call=%s prompt_tokens=%s cached_tokens=%s uncached_tokens=%s completion_tokens=%s elapsed_ms=%.1f",
+        trace_id,
+        call,
+        prompt_tokens,
+        cached_tokens,
+        counts["uncached_tokens"],
+        completion_tokens,
+        elapsed_seconds * 1000,
+    )
+    return counts
+
+
+def llm_usage_metrics() -> dict[str, Any]:
+    with _usage_lock:
+        snapshot = {call: dict(totals) for call, totals in _usage.items()}
+    metrics: dict[str, Any] = {}
+    for call, totals in snapshot.items():
+        prompt_tokens = totals.get("prompt_tokens", 0)
+        metrics[call] = {
+            "calls": int(totals["calls"]),
+            "calls_with_usage": int(totals.get("calls_with_usage", 0)),
+            "prompt_tokens": int(prompt_tokens),
+            "cached_tokens": int(totals.get("cached_tokens", 0)),
+            "uncached_tokens": int(totals.get("uncached_tokens", 0)),
+            "completion_tokens": int(totals.get("completion_tokens", 0)),
+            "cached_ratio": round(totals.get("cached_tokens", 0) / prompt_tokens, 3) if prompt_tokens else 0.0,
+        }
+        for hit in ("cache_hit", "cache_miss"):
+            calls = totals.get(f"{hit}_calls", 0)
+            metrics[call][f"{hit}_calls"] = int(calls)
+            metrics[call][f"{hit}_avg_ms"] = (
+                round(totals[f"{hit}_seconds"] / calls * 1000, 1) if calls else None
+            )
+    return metrics
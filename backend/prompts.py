@@ -1,4 +1,8 @@
-INCIDENT_ANALYSIS_PROMPT = """
+# Each prompt is a static system message followed by a per-request user message.
+# The system text must stay byte-identical between requests (no timestamps, ids
+# or request data) so the provider's prompt cache can reuse it as a prefix.
+
+INCIDENT_ANALYSIS_SYSTEM_PROMPT = """
 You are a senior DevOps SRE expert.
 
 Use the retrieved context to analyze the new incident.
@@ -32,7 +36,9 @@ Field guidance:
 - resolution_steps: ordered actionable steps.
 - preventive_actions: future risk-reduction actions.
 - confidence_score: decimal in [0, 1].
+"""
 
+INCIDENT_ANALYSIS_USER_PROMPT = """
 Retrieved Context:
 {context}
 
@@ -41,7 +47,7 @@ New Incident:
 """
 
 
-FOLLOW_UP_DISCUSSION_PROMPT = """
+FOLLOW_UP_DISCUSSION_SYSTEM_PROMPT = """
 You are a senior DevOps SRE expert continuing a follow-up discussion.
 
 Rules:
@@ -50,19 +56,25 @@ Rules:
 3. If evidence is insufficient, explicitly say what is unknown.
 4. Do not invent logs, metrics, or system states.
 5. Keep response in plain text (not JSON) for conversational UX.
+"""
 
+# Ordered from most to least stable within a discussion: incident and analysis
+# are fixed; chat history is the last 8 messages, so it only grows until the
+# window is full and then shifts every turn; retrieved context and the question
+# change every turn and come last.
+FOLLOW_UP_DISCUSSION_USER_PROMPT = """
 Incident:
 {incident_text}
 
 Prior Structured Analysis:
 {analysis_json}
 
-Retrieved Context:
-{context}
-
 Chat History:
 {chat_history}
 
+Retrieved Context:
+{context}
+
 Follow-up Question:
 {question}
 """
@@ -1,24 +1,64 @@
 import json
 import os
 import re
-from threading import RLock
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, RLock, Thread
+from typing import Any, Callable
 
+import faiss
+import numpy as np
 from langchain.docstore.document import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain.prompts import ChatPromptTemplate
-from langchain.chains import RetrievalQA
-from langchain.schema.output_parser import StrOutputParser
+from index_store import (
+    FAISS_SHARD_BY,
+    UNSHARDED,
+    coarse_dimensions_for_backend,
+    index_path_for_backend,
+    index_write_lock,
+    list_shards,
+    load_snapshot,
+    publish_snapshot,
+    read_current_version,
+    read_manifest,
+    shard_name,
+    shard_path,
+    snapshot_path,
+)
+from indexing_queue import complete_job, enqueue_job, mark_job_running
 from logging_config import get_logger
-from model_config import get_chat_llm, get_embeddings
-from prompts import FOLLOW_UP_DISCUSSION_PROMPT, INCIDENT_ANALYSIS_PROMPT
+from model_config import (
+    EMBEDDING_BACKEND,
+    get_chat_llm,
+    get_embedding_backend_id,
+    get_embeddings,
+)
+from pattern_matcher import (
+    PatternMatcher,
+    load_library_signatures,
+    parse_pattern_documents,
+    templated_analysis,
+)
+from prompt_assembly import analysis_messages, follow_up_messages, prompt_chars, record_llm_usage
 from stackexchange_tool import fetch_stackoverflow_results
+from vector_storage import (
+    extend_coarse_index,
+    is_quantized,
+    load_coarse_index,
+    load_full_vectors,
+    search_with_rerank,
+)
 
 # ==========================
 # CONFIG
 # ==========================
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-FAISS_INDEX_PATH = os.path.join(BASE_DIR, "faiss_index")
+PATTERN_LIBRARY_PATH = os.path.join(BASE_DIR, "data", "ERROR PATTERN LIBRARY")
+FAISS_INDEX_PATH = index_path_for_backend(EMBEDDING_BACKEND)
+EMBEDDING_BACKEND_ID = get_embedding_backend_id()
+COARSE_DIMENSIONS = coarse_dimensions_for_backend(EMBEDDING_BACKEND)
 ENABLE_WEB_ENRICHMENT = os.getenv("ENABLE_WEB_ENRICHMENT", "true").strip().lower() in {
     "1",
     "true",
@@ -26,18 +66,140 @@ ENABLE_WEB_ENRICHMENT = os.getenv("ENABLE_WEB_ENRICHMENT", "true").strip().lower
     "on",
 }
 WEB_RESULTS_K = int(os.getenv("WEB_RESULTS_K", "3"))
+RETRIEVER_K = 4
+INDEX_WATCH_INTERVAL_SECONDS = float(os.getenv("INDEX_WATCH_INTERVAL_SECONDS", "5"))
+# Incidents clearly about exactly one Error Pattern Library entry (several of
+# its signatures, or signatures covering most of the text) are answered from the
+# pattern document without an LLM call.
+PATTERN_FAST_PATH_ENABLED = os.getenv("PATTERN_FAST_PATH_ENABLED", "true").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+PATTERN_MIN_SIGNATURES = max(1, int(os.getenv("PATTERN_MIN_SIGNATURES", "2")))
+PATTERN_MIN_COVERAGE = float(os.getenv("PATTERN_MIN_COVERAGE", "0.5"))
+PATTERN_LLM_REFINEMENT = os.getenv("PATTERN_LLM_REFINEMENT", "false").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+# Refinement LLM calls run on their own small pool, never on the index job
+# worker, and are dropped rather than queued without bound.
+PATTERN_REFINEMENT_WORKERS = max(1, int(os.getenv("PATTERN_REFINEMENT_WORKERS", "1")))
+PATTERN_REFINEMENT_MAX_PENDING = max(0, int(os.getenv("PATTERN_REFINEMENT_MAX_PENDING", "8")))
+ANALYSIS_REFINEMENT_JOB = "analysis_refinement"
+# With FAISS_SHARD_BY set, retrieval merges per-shard results and caps how many
+# of the top RETRIEVER_K documents one shard may take ("pattern:2,runbook:1");
+# unused slots go to the next-closest documents from any shard.
+FAISS_SHARD_DEFAULT_QUOTA = max(1, int(os.getenv("FAISS_SHARD_DEFAULT_QUOTA", str(max(1, RETRIEVER_K // 2)))))
+FAISS_SHARD_SEARCH_WORKERS = int(os.getenv("FAISS_SHARD_SEARCH_WORKERS", "0")) or None
+
+
+class UnknownShardError(ValueError):
+    pass
+
+
+def _parse_shard_quotas(raw: str) -> dict[str, int]:
+    quotas: dict[str, int] = {}
+    for item in raw.split(","):
+        if not item.strip():
+            continue
+        name, separator, value = item.partition(":")
+        if not separator or not value.strip().isdigit():
+            raise ValueError(f"Invalid FAISS_SHARD_QUOTAS entry '{item.strip()}'. Use shard:count.")
+        quotas[shard_name({FAISS_SHARD_BY: name.strip()})] = int(value)
+    return quotas
+
+
+FAISS_SHARD_QUOTAS = _parse_shard_quotas(os.getenv("FAISS_SHARD_QUOTAS", ""))
 logger = get_logger(__name__)
-RAG_LOCK = RLock()
+_RELOAD_LOCK = RLock()
+# FAISS releases the GIL while scanning, so shards are searched in parallel.
+_shard_search_pool = ThreadPoolExecutor(
+    max_workers=FAISS_SHARD_SEARCH_WORKERS,
+    thread_name_prefix="shard-search",
+)
+_refinement_pool = ThreadPoolExecutor(
+    max_workers=PATTERN_REFINEMENT_WORKERS,
+    thread_name_prefix="analysis-refinement",
+)
+_refinement_lock = Lock()
+_refinement_pending = 0
 
 embeddings = get_embeddings()
 
-vectorstore = FAISS.load_local(
-    FAISS_INDEX_PATH,
-    embeddings,
-    allow_dangerous_deserialization=True
-)
 
-retriever = vectorstore.as_retriever(search_kwargs={"k": 4})
+def _shard_patterns(shard: str, store: Any) -> list[dict[str, Any]]:
+    # Sharded by category, only the "pattern" shard holds library documents.
+    if FAISS_SHARD_BY == "category" and shard != "pattern":
+        return []
+    docs = [store.docstore.search(doc_id) for doc_id in store.index_to_docstore_id.values()]
+    patterns = parse_pattern_documents(docs)
+    stale = [pattern["title"] for pattern in patterns if not pattern["metadata"].get("signatures")]
+    if not stale:
+        return patterns
+    # Indexed before the library declared signatures: only the titles would match.
+    patterns = parse_pattern_documents(docs, load_library_signatures(PATTERN_LIBRARY_PATH))
+    logger.warning(
+        "Pattern documents indexed without signatures | shard=%s patterns=%s "
+        "action=using %s until ingest_faiss.py is re-run",
+        shard,
+        ",".join(stale),
+        PATTERN_LIBRARY_PATH,
+    )
+    return patterns
+
+
+def _load_shard_state(shard: str) -> dict[str, Any]:
+    path = shard_path(FAISS_INDEX_PATH, shard)
+    version, store = load_snapshot(embeddings, path)
+    manifest = read_manifest(version, path)
+    indexed_backend = manifest.get("embedding_backend")
+    if indexed_backend and indexed_backend != EMBEDDING_BACKEND_ID:
+        raise ValueError(
+            f"Index at {path} was built with embedding backend "
+            f"'{indexed_backend}' but '{EMBEDDING_BACKEND_ID}' is configured. "
+            "Re-run ingest_faiss.py with the configured EMBEDDING_BACKEND."
+        )
+    return {
+        "shard": shard,
+        "path": path,
+        "version": version,
+        "embedding_backend": indexed_backend or "unknown",
+        "vectorstore": store,
+        "full_vectors": load_full_vectors(snapshot_path(version, path)),
+        "coarse_index": load_coarse_index(snapshot_path(version, path)),
+        "patterns": _shard_patterns(shard, store),
+        "loaded_at": time.time(),
+    }
+
+
+def _assemble(shards: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    return {
+        "shards": shards,
+        "pattern_matcher": PatternMatcher(
+            pattern for state in shards.values() for pattern in state["patterns"]
+        ),
+    }
+
+
+def _load_index_state() -> dict[str, Any]:
+    shards = list_shards(FAISS_INDEX_PATH)
+    if not shards:
+        raise FileNotFoundError(
+            f"No index shards published under {FAISS_INDEX_PATH}. "
+            f"Run ingest_faiss.py with FAISS_SHARD_BY={FAISS_SHARD_BY}."
+        )
+    return _assemble({shard: _load_shard_state(shard) for shard in shards})
+
+
+# Swapped as a whole by reload_index(); readers take one reference and keep
+# using it, so in-flight searches finish on the snapshots they started with.
+_active_index = _load_index_state()
+_watcher_stop: Event | None = None
+_watcher_thread: Thread | None = None
 
 # ==========================
 # LLM (Allowed Model)
@@ -46,50 +208,254 @@ retriever = vectorstore.as_retriever(search_kwargs={"k": 4})
 llm = get_chat_llm()
 
 # ==========================
-# PROMPT
+# INDEX LIFECYCLE
 # ==========================
 
-prompt = ChatPromptTemplate.from_template(INCIDENT_ANALYSIS_PROMPT)
-followup_prompt = ChatPromptTemplate.from_template(FOLLOW_UP_DISCUSSION_PROMPT)
 
-# ==========================
-# CHAIN
-# ==========================
+def _shard_status(state: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "version": state["version"] or "legacy",
+        "published_version": read_current_version(state["path"]) or "legacy",
+        "documents": state["vectorstore"].index.ntotal,
+        "embedding_backend": state["embedding_backend"],
+        "quantized": is_quantized(state["vectorstore"].index),
+        "full_precision_store": state["full_vectors"] is not None,
+        "coarse_dimensions": state["coarse_index"].d if state["coarse_index"] is not None else 0,
+        "patterns": len(state["patterns"]),
+        "loaded_at": state["loaded_at"],
+    }
 
-qa_chain = RetrievalQA.from_chain_type(
-    llm=llm,
-    retriever=retriever,
-    chain_type="stuff",
-)
+
+def get_index_status() -> dict[str, Any]:
+    active = _active_index
+    shards = {name: _shard_status(state) for name, state in active["shards"].items()}
+    statuses = list(shards.values())
+    return {
+        "version": max(status["version"] for status in statuses),
+        "published_version": max(status["published_version"] for status in statuses),
+        "documents": sum(status["documents"] for status in statuses),
+        "embedding_backend": ",".join(sorted({status["embedding_backend"] for status in statuses})),
+        "quantized": any(status["quantized"] for status in statuses),
+        "full_precision_store": all(status["full_precision_store"] for status in statuses),
+        "coarse_dimensions": max(status["coarse_dimensions"] for status in statuses),
+        "patterns": len(active["pattern_matcher"].patterns),
+        "loaded_at": max(status["loaded_at"] for status in statuses),
+        "watcher_running": _watcher_thread is not None and _watcher_thread.is_alive(),
+        "shard_by": FAISS_SHARD_BY,
+        "shards": shards,
+    }
 
 
-def _sanitize_blocked_keywords(text: str) -> str:
-    replacements = {
-        "symptoms": "indicators",
-        "Symptoms": "Indicators",
+def snapshot_manifest(store: Any, shard: str = UNSHARDED) -> dict[str, Any]:
+    manifest = {"embedding_backend": EMBEDDING_BACKEND_ID, "dimension": store.index.d}
+    if shard != UNSHARDED:
+        manifest.update(shard=shard, shard_by=FAISS_SHARD_BY)
+    return manifest
+
+
+def _swap_shards(states: list[dict[str, Any]]) -> None:
+    global _active_index
+    with _RELOAD_LOCK:
+        shards = dict(_active_index["shards"])
+        shards.update((state["shard"], state) for state in states)
+        _active_index = _assemble(dict(sorted(shards.items())))
+
+
+def reload_index(force: bool = False, shard: str | None = None) -> dict[str, Any]:
+    """Load published snapshots and swap in the shards whose version changed."""
+    with _RELOAD_LOCK:
+        active_shards = _active_index["shards"]
+        published_shards = list_shards(FAISS_INDEX_PATH)
+        if shard is None:
+            names = sorted(set(active_shards) | set(published_shards))
+        elif shard in active_shards or shard in published_shards:
+            names = [shard]
+        else:
+            raise UnknownShardError(f"Unknown index shard '{shard}'.")
+
+        loaded: list[dict[str, Any]] = []
+        for name in names:
+            current = active_shards.get(name)
+            published_version = read_current_version(shard_path(FAISS_INDEX_PATH, name))
+            if not force and current is not None and published_version == current["version"]:
+                continue
+            started = time.perf_counter()
+            state = _load_shard_state(name)
+            loaded.append(state)
+            logger.info(
+                "Index reloaded | shard=%s previous=%s version=%s documents=%s elapsed_ms=%.1f",
+                name,
+                (current["version"] or "legacy") if current is not None else "none",
+                state["version"] or "legacy",
+                state["vectorstore"].index.ntotal,
+                (time.perf_counter() - started) * 1000,
+            )
+        if loaded:
+            _swap_shards(loaded)
+    return {
+        "reloaded": bool(loaded),
+        "reloaded_shards": [state["shard"] for state in loaded],
+        **get_index_status(),
+    }
+
+
+def _publish_shard(
+    state: dict[str, Any],
+    full_vectors: np.ndarray | None,
+    coarse_index: Any = None,
+    appended_vectors: np.ndarray | None = None,
+) -> dict[str, Any]:
+    """Publish a shard's (mutated) store and return the state that replaces it."""
+    store = state["vectorstore"]
+    version = publish_snapshot(
+        store,
+        state["path"],
+        manifest=snapshot_manifest(store, state["shard"]),
+        full_vectors=full_vectors,
+        coarse_index=coarse_index,
+        coarse_dimensions=COARSE_DIMENSIONS,
+        appended_vectors=appended_vectors,
+    )
+    return {
+        **state,
+        "version": version,
+        "embedding_backend": EMBEDDING_BACKEND_ID,
+        "full_vectors": load_full_vectors(snapshot_path(version, state["path"])),
+        "coarse_index": load_coarse_index(snapshot_path(version, state["path"])),
+        "patterns": _shard_patterns(state["shard"], store),
     }
-    for source, target in replacements.items():
-        text = text.replace(source, target)
-    return text
+
+
+def _search_shards(
+    states: list[dict[str, Any]],
+    search: Callable[[dict[str, Any]], list[tuple[Document, float]]],
+) -> list[list[tuple[Document, float]]]:
+    if len(states) == 1:
+        return [search(states[0])]
+    return list(_shard_search_pool.map(search, states))
+
+
+def _merge_with_quotas(
+    shards: list[str],
+    results: list[list[tuple[Document, float]]],
+    k: int,
+) -> list[tuple[Document, float]]:
+    """Top ``k`` by L2 distance across shards, each shard capped at its quota."""
+    if len(results) == 1:
+        return results[0][:k]
+    ranked = sorted(
+        ((score, shard, doc) for shard, pairs in zip(shards, results) for doc, score in pairs),
+        key=lambda item: item[0],
+    )
+    taken: list[tuple[float, str, Document]] = []
+    overflow: list[tuple[float, str, Document]] = []
+    counts: dict[str, int] = {}
+    for item in ranked:
+        shard = item[1]
+        if len(taken) < k and counts.get(shard, 0) < FAISS_SHARD_QUOTAS.get(shard, FAISS_SHARD_DEFAULT_QUOTA):
+            counts[shard] = counts.get(shard, 0) + 1
+            taken.append(item)
+        else:
+            overflow.append(item)
+    # Quotas only stop one shard crowding out the others, never leave slots empty.
+    taken.extend(overflow[: k - len(taken)])
+    taken.sort(key=lambda item: item[0])
+    return [(doc, score) for score, _, doc in taken]
+
+
+def _retrieve(active: dict[str, Any], query: str, k: int = RETRIEVER_K) -> list[Document]:
+    query_vector = embeddings.embed_query(query)
+    states = list(active["shards"].values())
+
+    def search(state: dict[str, Any]) -> list[tuple[Document, float]]:
+        return search_with_rerank(
+            state["vectorstore"],
+            query_vector,
+            k,
+            full_vectors=state["full_vectors"],
+            coarse_index=state["coarse_index"],
+        )
+
+    results = _merge_with_quotas(
+        [state["shard"] for state in states],
+        _search_shards(states, search),
+        k,
+    )
+    return [doc for doc, _ in results]
+
+
+def _watch_index(stop_event: Event) -> None:
+    while not stop_event.wait(INDEX_WATCH_INTERVAL_SECONDS):
+        try:
+            reload_index()
+        except Exception:
+            logger.exception("Index watcher reload failed")
+
+
+def start_index_watcher() -> None:
+    global _watcher_stop, _watcher_thread
+    if _watcher_thread is not None and _watcher_thread.is_alive():
+        return
+    _watcher_stop = Event()
+    _watcher_thread = Thread(
+        target=_watch_index,
+        args=(_watcher_stop,),
+        name="index-watcher",
+        daemon=True,
+    )
+    _watcher_thread.start()
+    logger.info("Index watcher started | interval_s=%s", INDEX_WATCH_INTERVAL_SECONDS)
+
+
+def stop_index_watcher() -> None:
+    global _watcher_thread
+    if _watcher_stop is not None:
+        _watcher_stop.set()
+    if _watcher_thread is not None:
+        _watcher_thread.join(timeout=INDEX_WATCH_INTERVAL_SECONDS + 1)
+        _watcher_thread = None
+        logger.info("Index watcher stopped")
+
+
+def _invoke_llm(call: str, messages: list[Any], trace_id: str) -> Any:
+    started = time.perf_counter()
+    response = llm.invoke(messages)
+    record_llm_usage(call, response, time.perf_counter() - started, trace_id)
+    return response
+
+
+def _context_text(docs: list[Document]) -> str:
+    # Rank order (best match first, after shard quotas): it carries relevance,
+    # which outweighs a cache hit on the context section.
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+_TECHNICAL_KEYWORDS = {
+    "error", "errors", "incident", "failure", "failed", "timeout", "latency",
+    "cpu", "memory", "oom", "pod", "service", "api", "http", "5xx", "4xx",
+    "database", "db", "crash", "restart", "unavailable", "exception", "alert",
+    "degraded", "slow", "spike", "connection", "kafka", "queue",
+}
+# Substring semantics as before ("db" matches "mongodb"), but one scan instead
+# of a loop over every keyword.
+_TECHNICAL_KEYWORD_PATTERN = re.compile(
+    "|".join(re.escape(keyword) for keyword in sorted(_TECHNICAL_KEYWORDS, key=len, reverse=True)),
+    re.IGNORECASE,
+)
+_WORD_PATTERN = re.compile(r"\w+")
+_DIGIT_PATTERN = re.compile(r"\d")
 
 
 def _is_meaningful_incident_text(text: str) -> tuple[bool, str]:
     cleaned = text.strip()
     if len(cleaned) < 20:
         return False, "Input is too short."
-    words = re.findall(r"\w+", cleaned)
+    words = _WORD_PATTERN.findall(cleaned)
     if len(words) < 4:
         return False, "Input must contain at least 4 words."
 
-    technical_keywords = {
-        "error", "errors", "incident", "failure", "failed", "timeout", "latency",
-        "cpu", "memory", "oom", "pod", "service", "api", "http", "5xx", "4xx",
-        "database", "db", "crash", "restart", "unavailable", "exception", "alert",
-        "degraded", "slow", "spike", "connection", "kafka", "queue",
-    }
-    lowered = cleaned.lower()
-    has_keyword = any(keyword in lowered for keyword in technical_keywords)
-    has_number = bool(re.search(r"\d", cleaned))
+    has_keyword = _TECHNICAL_KEYWORD_PATTERN.search(cleaned) is not None
+    has_number = _DIGIT_PATTERN.search(cleaned) is not None
     if not has_keyword and not has_number:
         return False, "Input has insufficient technical signal."
     return True, ""
@@ -145,6 +511,34 @@ def _build_external_context(incident_text: str, trace_id: str) -> str:
     return "\n".join(lines)
 
 
+def _pattern_fast_path(incident_text: str, trace_id: str) -> str | None:
+    started = time.perf_counter()
+    hit = _active_index["pattern_matcher"].match(
+        incident_text,
+        min_signatures=PATTERN_MIN_SIGNATURES,
+        min_coverage=PATTERN_MIN_COVERAGE,
+    )
+    if hit is None:
+        return None
+
+    payload = templated_analysis(hit)
+    if PATTERN_LLM_REFINEMENT:
+        refinement_job_id = _submit_refinement(incident_text, trace_id)
+        if refinement_job_id:
+            payload["refinement_job_id"] = refinement_job_id
+    logger.info(
+        "Pattern fast path matched | trace_id=%s pattern=%s signatures=%s coverage=%s confidence=%s refinement_job=%s elapsed_ms=%.2f",
+        trace_id,
+        payload["matched_pattern"],
+        "|".join(hit["signatures"]),
+        hit["coverage"],
+        payload["confidence_score"],
+        payload.get("refinement_job_id", "none"),
+        (time.perf_counter() - started) * 1000,
+    )
+    return json.dumps(payload)
+
+
 def analyze_incident(incident_text: str, trace_id: str = "script") -> str:
     logger.info("Analyze incident started | trace_id=%s input_len=%s", trace_id, len(incident_text))
     is_valid, reason = _is_meaningful_incident_text(incident_text)
@@ -152,39 +546,305 @@ def analyze_incident(incident_text: str, trace_id: str = "script") -> str:
         logger.info("Input rejected by validator | trace_id=%s reason=%s", trace_id, reason)
         return _insufficient_input_response(reason)
 
-    with RAG_LOCK:
-        docs = retriever.invoke(incident_text)
+    if PATTERN_FAST_PATH_ENABLED:
+        fast_result = _pattern_fast_path(incident_text, trace_id)
+        if fast_result is not None:
+            return fast_result
+    return _llm_analysis(incident_text, trace_id)
+
+
+def _llm_analysis(incident_text: str, trace_id: str) -> str:
+    docs = _retrieve(_active_index, incident_text)
     logger.info("Retriever completed | trace_id=%s docs=%s", trace_id, len(docs))
 
-    context = "\n\n".join([doc.page_content for doc in docs])
+    context = _context_text(docs)
     external_context = _build_external_context(incident_text, trace_id=trace_id)
     if external_context:
         context = f"{context}\n\nExternal Context:\n{external_context}"
-    context = _sanitize_blocked_keywords(context)
-    incident_text = _sanitize_blocked_keywords(incident_text)
 
-    final_prompt = prompt.format(
-        context=context,
-        question=incident_text
-    )
+    messages = analysis_messages(context, incident_text)
+    static_chars, request_chars = prompt_chars(messages)
     logger.info(
-        "Prompt prepared | trace_id=%s context_chars=%s question_chars=%s",
+        "Prompt prepared | trace_id=%s context_chars=%s question_chars=%s static_prefix_chars=%s request_chars=%s",
         trace_id,
         len(context),
         len(incident_text),
+        static_chars,
+        request_chars,
     )
 
-    response = llm.invoke(final_prompt)
+    response = _invoke_llm("analysis", messages, trace_id)
     logger.info("LLM response received | trace_id=%s output_len=%s", trace_id, len(response.content))
     return response.content
 
 
-def add_knowledge_document(content: str, metadata: dict, source_id: str) -> None:
-    doc = Document(page_content=content, metadata=metadata | {"source_id": source_id})
-    with RAG_LOCK:
-        vectorstore.add_documents([doc])
-        vectorstore.save_local(FAISS_INDEX_PATH)
-    logger.info("Knowledge indexed into FAISS | source_id=%s", source_id)
+def _refine_analysis(job_id: str, incident_text: str, trace_id: str) -> None:
+    """Full LLM analysis for an incident answered by the fast path; one attempt only."""
+    global _refinement_pending
+    try:
+        mark_job_running(job_id)
+        try:
+            raw_output = _llm_analysis(incident_text, trace_id)
+        except Exception as exc:
+            logger.warning("Analysis refinement failed | trace_id=%s job_id=%s error=%s", trace_id, job_id, exc)
+            complete_job(job_id, exc)
+            return
+        try:
+            parsed_output = json.loads(raw_output)
+        except ValueError:
+            parsed_output = None
+        complete_job(
+            job_id,
+            {
+                "raw_output": raw_output,
+                "parsed_output": parsed_output if isinstance(parsed_output, dict) else None,
+            },
+        )
+    finally:
+        with _refinement_lock:
+            _refinement_pending -= 1
+
+
+def _submit_refinement(incident_text: str, trace_id: str) -> str | None:
+    """Queue a refinement on its own pool; returns the job id, or None when the pool is saturated."""
+    global _refinement_pending
+    with _refinement_lock:
+        if _refinement_pending >= PATTERN_REFINEMENT_MAX_PENDING:
+            logger.warning(
+                "Analysis refinement skipped | trace_id=%s pending=%s",
+                trace_id,
+                _refinement_pending,
+            )
+            return None
+        _refinement_pending += 1
+    try:
+        job = enqueue_job(ANALYSIS_REFINEMENT_JOB, {"trace_id": trace_id})
+        _refinement_pool.submit(_refine_analysis, job["id"], incident_text, trace_id)
+    except Exception:
+        with _refinement_lock:
+            _refinement_pending -= 1
+        raise
+    return job["id"]
+
+
+def embed_knowledge_texts(contents: list[str]) -> list[list[float]]:
+    return embeddings.embed_documents(contents)
+
+
+def find_similar_knowledge(
+    embedding: list[float],
+    k: int = 3,
+    category: str | None = "learned_incident",
+) -> list[tuple[Document, float]]:
+    """Nearest indexed documents to a precomputed vector as (doc, L2 distance)."""
+    active = _active_index
+    search_filter = {"category": category} if category else None
+    states = list(active["shards"].values())
+    if FAISS_SHARD_BY == "category" and category:
+        # The category filter already names the only shard that can match.
+        state = active["shards"].get(shard_name({"category": category}))
+        states = [state] if state is not None else []
+    if not states:
+        return []
+
+    def search(state: dict[str, Any]) -> list[tuple[Document, float]]:
+        return state["vectorstore"].similarity_search_with_score_by_vector(
+            embedding,
+            k=k,
+            filter=search_filter,
+        )
+
+    results = [pair for pairs in _search_shards(states, search) for pair in pairs]
+    return sorted(results, key=lambda pair: pair[1])[:k]
+
+
+def _copy_store(store: FAISS, share_index: bool = False) -> FAISS:
+    """A private copy of a live store for a writer to change and publish.
+
+    Published stores are never modified: searches keep using the live one, and
+    a failed publish just drops the copy.
+    """
+    return FAISS(
+        store.embedding_function,
+        store.index if share_index else faiss.clone_index(store.index),
+        InMemoryDocstore(dict(store.docstore._dict)),
+        dict(store.index_to_docstore_id),
+        relevance_score_fn=store.override_relevance_score_fn,
+        normalize_L2=store._normalize_L2,
+        distance_strategy=store.distance_strategy,
+    )
+
+
+def _indexed_source_ids(store: FAISS) -> set[str]:
+    return {
+        document.metadata["source_id"]
+        for document in store.docstore._dict.values()
+        if document.metadata.get("source_id")
+    }
+
+
+def _add_to_shard(shard: str, entries: list[dict[str, Any]], vectors: list[list[float]]) -> str:
+    path = shard_path(FAISS_INDEX_PATH, shard)
+    with index_write_lock(path):
+        # Another worker or an ingest run may have published since our last load.
+        if shard in _active_index["shards"] or read_current_version(path) is not None:
+            reload_index(shard=shard)
+        live = _active_index["shards"].get(shard)
+        if live is not None:
+            # A retried job may resubmit documents its earlier attempt already
+            # published; indexing them again would duplicate them.
+            indexed = _indexed_source_ids(live["vectorstore"])
+            pending = [
+                (entry, vector)
+                for entry, vector in zip(entries, vectors)
+                if entry["source_id"] not in indexed
+            ]
+            if len(pending) < len(entries):
+                logger.info(
+                    "Skipped already indexed documents | shard=%s skipped=%s",
+                    shard,
+                    len(entries) - len(pending),
+                )
+            if not pending:
+                return live["version"]
+            entries = [entry for entry, _ in pending]
+            vectors = [vector for _, vector in pending]
+        text_embeddings = [(entry["content"], vector) for entry, vector in zip(entries, vectors)]
+        metadatas = [
+            entry["metadata"] | {
+                "source_id": entry["source_id"],
+                "embedding_backend": EMBEDDING_BACKEND_ID,
+            }
+            for entry in entries
+        ]
+        full_vectors = None
+        appended_vectors = None
+        coarse_index = None
+        if live is None:
+            state = {
+                "shard": shard,
+                "path": path,
+                "vectorstore": FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas),
+                "full_vectors": None,
+                "loaded_at": time.time(),
+            }
+            logger.info("Index shard created | shard=%s documents=%s", shard, len(entries))
+        else:
+            store = _copy_store(live["vectorstore"])
+            store.add_embeddings(text_embeddings, metadatas=metadatas)
+            state = {**live, "vectorstore": store}
+            if is_quantized(store.index) and live["full_vectors"] is not None:
+                # The memory-mapped store is copied to the new snapshot block by block.
+                full_vectors = live["full_vectors"]
+                appended_vectors = np.asarray(vectors, dtype="float32")
+            elif is_quantized(store.index) and live.get("coarse_index") is not None:
+                # No re-rank store to rebuild from: extend the coarse index instead.
+                coarse_index = extend_coarse_index(live["coarse_index"], vectors)
+        # If this raises, the live state is untouched and keeps serving.
+        state = _publish_shard(state, full_vectors, coarse_index, appended_vectors)
+        _swap_shards([state])
+    return state["version"]
+
+
+def add_knowledge_documents(entries: list[dict[str, Any]]) -> str:
+    """Index several documents, publishing one snapshot per affected shard.
+
+    Each entry carries ``content``, ``metadata``, ``source_id`` and an optional
+    precomputed ``embedding``. Returns the new version, or ``shard@version``
+    pairs when the entries span several shards.
+    """
+    missing = [entry for entry in entries if entry.get("embedding") is None]
+    computed = iter(embeddings.embed_documents([entry["content"] for entry in missing]) if missing else [])
+    grouped: dict[str, tuple[list[dict[str, Any]], list[list[float]]]] = {}
+    for entry in entries:
+        vector = entry["embedding"] if entry.get("embedding") is not None else next(computed)
+        shard_entries, shard_vectors = grouped.setdefault(shard_name(entry["metadata"]), ([], []))
+        shard_entries.append(entry)
+        shard_vectors.append(vector)
+
+    versions = {
+        shard: _add_to_shard(shard, shard_entries, shard_vectors)
+        for shard, (shard_entries, shard_vectors) in grouped.items()
+    }
+    if len(versions) == 1:
+        version = next(iter(versions.values()))
+    else:
+        version = ",".join(f"{shard}@{shard_version}" for shard, shard_version in versions.items())
+    logger.info(
+        "Knowledge indexed into FAISS | documents=%s source_ids=%s version=%s",
+        len(entries),
+        ",".join(entry["source_id"] for entry in entries),
+        version,
+    )
+    return version
+
+
+def add_knowledge_document(
+    content: str,
+    metadata: dict,
+    source_id: str,
+    embedding: list[float] | None = None,
+) -> None:
+    add_knowledge_documents(
+        [
+            {
+                "content": content,
+                "metadata": metadata,
+                "source_id": source_id,
+                "embedding": embedding,
+            }
+        ]
+    )
+
+
+def update_knowledge_document(content: str, metadata: dict, source_id: str) -> bool:
+    """Rewrite an indexed document in place, keeping its existing vector."""
+    routed = shard_name(metadata)
+    # The metadata's shard first; the rest cover documents indexed before a
+    # category / service change.
+    candidates = [routed, *(name for name in _active_index["shards"] if name != routed)]
+    for shard in candidates:
+        path = shard_path(FAISS_INDEX_PATH, shard)
+        with index_write_lock(path):
+            if shard not in _active_index["shards"] and read_current_version(path) is None:
+                continue
+            reload_index(shard=shard)
+            live = _active_index["shards"][shard]
+            doc_ids = [
+                doc_id
+                for doc_id in live["vectorstore"].index_to_docstore_id.values()
+                if live["vectorstore"].docstore.search(doc_id).metadata.get("source_id") == source_id
+            ]
+            if not doc_ids:
+                continue
+            # Vectors are unchanged, so only the docstore is copied.
+            store = _copy_store(live["vectorstore"], share_index=True)
+            for doc_id in doc_ids:
+                store.docstore.delete([doc_id])
+                store.docstore.add(
+                    {
+                        doc_id: Document(
+                            page_content=content,
+                            metadata=metadata | {
+                                "source_id": source_id,
+                                "embedding_backend": EMBEDDING_BACKEND_ID,
+                            },
+                        )
+                    }
+                )
+            state = _publish_shard(
+                {**live, "vectorstore": store}, live["full_vectors"], live["coarse_index"]
+            )
+            _swap_shards([state])
+        logger.info(
+            "Knowledge document updated | source_id=%s shard=%s version=%s",
+            source_id,
+            shard,
+            state["version"],
+        )
+        return True
+    logger.warning("Knowledge update found no indexed document | source_id=%s", source_id)
+    return False
 
 
 def follow_up_discussion(
@@ -204,11 +864,9 @@ def follow_up_discussion(
     if not incident_text.strip() or not question.strip():
         return "Please provide both incident context and a follow-up question."
 
-    with RAG_LOCK:
-        docs = retriever.invoke(f"{incident_text}\n{question}")
+    docs = _retrieve(_active_index, f"{incident_text}\n{question}")
     logger.info("Follow-up retriever completed | trace_id=%s docs=%s", trace_id, len(docs))
-    context = "\n\n".join(doc.page_content for doc in docs)
-    context = _sanitize_blocked_keywords(context)
+    context = _context_text(docs)
 
     history_lines: list[str] = []
     for item in (chat_history or [])[-8:]:
@@ -219,15 +877,15 @@ def follow_up_discussion(
         history_lines.append(f"{role}: {content}")
     history_text = "\n".join(history_lines) if history_lines else "No previous follow-up messages."
 
-    final_prompt = followup_prompt.format(
-        incident_text=_sanitize_blocked_keywords(incident_text),
+    messages = follow_up_messages(
+        incident_text=incident_text,
         analysis_json=analysis_json or "{}",
-        context=context or "No retrieved context.",
         chat_history=history_text,
-        question=_sanitize_blocked_keywords(question),
+        context=context or "No retrieved context.",
+        question=question,
     )
 
-    response = llm.invoke(final_prompt)
+    response = _invoke_llm("follow_up", messages, trace_id)
     logger.info("Follow-up response received | trace_id=%s output_len=%s", trace_id, len(response.content))
     return response.content
 
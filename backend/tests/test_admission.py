@@ -0,0 +1,14 @@
+from admission import ADMISSION_DEFAULT_PRIORITY, classify_priority
+
+
+def test_free_text_never_promotes_to_critical():
+    assert classify_priority(None) == ADMISSION_DEFAULT_PRIORITY
+    assert classify_priority("interactive") == "interactive"
+
+
+def test_critical_requires_trusted_caller():
+    assert classify_priority("critical") == ADMISSION_DEFAULT_PRIORITY
+    assert classify_priority(None, severity="SEV-1") == ADMISSION_DEFAULT_PRIORITY
+    assert classify_priority("critical", trusted=True) == "critical"
+    assert classify_priority(None, severity="sev 0", trusted=True) == "critical"
+    assert classify_priority("interactive", severity="High", trusted=True) == "interactive"
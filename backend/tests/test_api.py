@@ -0,0 +1,20 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from profiling import profiling_status, request_profiles
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, "PROFILING_ENABLED", True)
+    request_profiles(1)
+    yield TestClient(api.app)
+    request_profiles(0)
+
+
+def test_rejected_log_upload_keeps_profile_budget(client):
+    response = client.post("/analyze/logs", content=b"all good here\n", headers={"Content-Type": "text/plain"})
+
+    assert response.status_code == 422
+    assert profiling_status()["pending_requests"] == 1
@@ -0,0 +1,34 @@
+import csv
+
+from bulk_import import IMPORT_CSV_FIELD_LIMIT_BYTES, normalize_record, parse_import_file
+
+
+def test_large_csv_field_is_parsed(tmp_path):
+    path = tmp_path / "export.csv"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "notes"])
+        writer.writerow(["INC-1", "Checkout outage", "x" * (256 * 1024)])
+
+    documents, skipped = parse_import_file(str(path))
+
+    assert IMPORT_CSV_FIELD_LIMIT_BYTES > 256 * 1024
+    assert len(documents) == 1
+    assert skipped == 0
+
+
+def test_unparseable_csv_is_skipped_not_raised(tmp_path):
+    path = tmp_path / "broken.csv"
+    path.write_bytes(b'id,title\n1,ok\n2,"' + b"x" * (IMPORT_CSV_FIELD_LIMIT_BYTES + 1) + b"\n")
+
+    documents, skipped = parse_import_file(str(path))
+
+    assert len(documents) == 1
+    assert skipped == 1
+
+
+def test_non_dict_metadata_is_ignored():
+    document = normalize_record({"content": "Disk full on db-1", "metadata": ["not", "a", "dict"]}, "x.json")
+
+    assert document is not None
+    assert document["metadata"]["source"] == "bulk_import"
@@ -0,0 +1,68 @@
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+import index_store
+import vector_storage
+from embedding_backends import HashedTermEmbeddings
+from index_store import coarse_dimensions_for_backend, publish_snapshot, read_manifest, snapshot_path
+from vector_storage import extend_coarse_index, load_coarse_index, load_full_vectors
+
+
+def _unit_vectors(count, dimension=32, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dimension)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_coarse_index_survives_saves_without_rerank_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_store, "FAISS_VECTOR_STORAGE", "int8")
+    monkeypatch.setattr(index_store, "FAISS_RERANK_STORE", False)
+    vectors = _unit_vectors(20)
+    store = FAISS.from_embeddings(
+        [(f"doc {i}", vector.tolist()) for i, vector in enumerate(vectors)],
+        HashedTermEmbeddings(dimension=32),
+    )
+    version = publish_snapshot(store, str(tmp_path), coarse_dimensions=8)
+    coarse_index = load_coarse_index(snapshot_path(version, str(tmp_path)))
+    assert coarse_index is not None
+
+    added = _unit_vectors(2, seed=1)
+    store.add_embeddings([(f"new {i}", vector.tolist()) for i, vector in enumerate(added)])
+    version = publish_snapshot(
+        store,
+        str(tmp_path),
+        coarse_index=extend_coarse_index(coarse_index, added),
+        coarse_dimensions=8,
+    )
+
+    assert read_manifest(version, str(tmp_path))["coarse_dimensions"] == 8
+    assert load_coarse_index(snapshot_path(version, str(tmp_path))).ntotal == 22
+
+
+def test_coarse_search_is_ignored_for_local_hash(monkeypatch):
+    monkeypatch.setattr(index_store, "FAISS_COARSE_DIMENSIONS", 256)
+
+    assert coarse_dimensions_for_backend("local_hash") == 0
+    assert coarse_dimensions_for_backend("azure") == 256
+
+
+def test_rerank_store_is_extended_on_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_store, "FAISS_VECTOR_STORAGE", "int8")
+    monkeypatch.setattr(index_store, "FAISS_RERANK_STORE", True)
+    monkeypatch.setattr(vector_storage, "FULL_VECTORS_COPY_ROWS", 7)
+    vectors = _unit_vectors(20)
+    store = FAISS.from_embeddings(
+        [(f"doc {i}", vector.tolist()) for i, vector in enumerate(vectors)],
+        HashedTermEmbeddings(dimension=32),
+    )
+    version = publish_snapshot(store, str(tmp_path), coarse_dimensions=8)
+    stored = load_full_vectors(snapshot_path(version, str(tmp_path)))
+    assert isinstance(stored, np.memmap)
+
+    added = _unit_vectors(3, seed=1)
+    store.add_embeddings([(f"new {i}", vector.tolist()) for i, vector in enumerate(added)])
+    version = publish_snapshot(store, str(tmp_path), full_vectors=stored, appended_vectors=added, coarse_dimensions=8)
+
+    np.testing.assert_array_equal(
+        load_full_vectors(snapshot_path(version, str(tmp_path))), np.concatenate([vectors, added])
+    )
+    assert load_coarse_index(snapshot_path(version, str(tmp_path))).ntotal == 23
@@ -0,0 +1,44 @@
+import pytest
+
+import indexing_queue
+from indexing_queue import STATUS_FAILED, STATUS_QUEUED, enqueue_job, get_job, mark_job_running
+
+
+@pytest.fixture
+def job_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(indexing_queue, "INDEX_JOBS_DB_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(indexing_queue, "INDEX_JOB_STALE_SECONDS", -1.0)
+    monkeypatch.setattr(indexing_queue, "_HANDLERS", {"handled": (lambda payloads: [], 1, None)})
+    indexing_queue._init_db()
+
+
+def test_stale_reclaim_requeues_only_handled_kinds(job_db):
+    handled = enqueue_job("handled", {})
+    indexing_queue._claim_jobs("handled", 1)
+    external = enqueue_job("external", {})
+    mark_job_running(external["id"])
+
+    indexing_queue._claim_jobs("other", 1)
+
+    assert get_job(handled["id"])["status"] == STATUS_QUEUED
+    job = get_job(external["id"])
+    assert job["status"] == STATUS_FAILED
+    assert "Abandoned" in job["error"]
+
+
+def test_failure_handler_runs_after_last_attempt(job_db, monkeypatch):
+    monkeypatch.setattr(indexing_queue, "INDEX_JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(indexing_queue, "INDEX_JOB_RETRY_BASE_SECONDS", 0.0)
+    failed = []
+    job = enqueue_job("handled", {"path": "upload.zip"})
+
+    def handler(payloads):
+        return [RuntimeError("boom") for _ in payloads]
+
+    indexing_queue._run_batch("handled", handler, 1, failed.append)
+    assert get_job(job["id"])["status"] == STATUS_QUEUED
+    assert failed == []
+
+    indexing_queue._run_batch("handled", handler, 1, failed.append)
+    assert get_job(job["id"])["status"] == STATUS_FAILED
+    assert failed == [{"path": "upload.zip"}]
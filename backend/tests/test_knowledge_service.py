@@ -0,0 +1,32 @@
+import knowledge_service
+
+
+def _existing_entry():
+    return {
+        "id": "DOC-LEARN-TEST0001",
+        "content": "Incident Description: Disk full on db-1\nOperator Notes: cleaned /var/log",
+        "metadata": {"category": "learned_incident", "occurrence_count": 1},
+    }
+
+
+def test_repeat_save_updates_json_without_republishing(tmp_path, monkeypatch):
+    updates = []
+    monkeypatch.setattr(knowledge_service, "LEARNED_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(knowledge_service, "update_knowledge_document", lambda **kwargs: updates.append(kwargs))
+
+    merged = knowledge_service._merge_into_existing(_existing_entry(), {"notes": "cleaned /var/log"}, "now")
+
+    assert merged["metadata"]["occurrence_count"] == 2
+    assert knowledge_service._load_learned_entry(merged["id"])["metadata"]["last_seen_at"] == "now"
+    assert updates == []
+
+
+def test_new_notes_republish_the_document(tmp_path, monkeypatch):
+    updates = []
+    monkeypatch.setattr(knowledge_service, "LEARNED_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(knowledge_service, "update_knowledge_document", lambda **kwargs: updates.append(kwargs))
+
+    knowledge_service._merge_into_existing(_existing_entry(), {"notes": "added disk alert"}, "now")
+
+    assert len(updates) == 1
+    assert "added disk alert" in updates[0]["content"]
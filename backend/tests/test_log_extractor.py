@@ -0,0 +1,88 @@
+import gzip
+import os
+import tracemalloc
+
+import pytest
+
+import log_extractor
+from log_extractor import LogEvidenceExtractor, LogTooLargeError, format_evidence
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _extract(data: bytes, chunk_size: int = 64 * 1024) -> dict:
+    extractor = LogEvidenceExtractor()
+    for offset in range(0, len(data), chunk_size):
+        extractor.feed(data[offset:offset + chunk_size])
+    return extractor.finish()
+
+
+def _fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+def test_java_stack_trace_is_kept_with_cause():
+    summary = _extract(_fixture("java_stack_trace.log"))
+
+    assert len(summary["stack_traces"]) == 1
+    trace = summary["stack_traces"][0]["lines"]
+    assert "Request failed" in trace[0]
+    assert trace[1].startswith("java.lang.NullPointerException:")
+    assert any(line.startswith("Caused by:") and "HikariPool" in line for line in trace)
+    samples = [entry["sample"] for entry in summary["error_signatures"]]
+    assert any(sample.startswith("java.lang.NullPointerException") for sample in samples)
+    assert any(sample.startswith("Caused by:") for sample in samples)
+    assert "Connection is not available" in format_evidence(summary)
+
+
+def test_java_stack_trace_across_chunk_boundaries():
+    data = _fixture("java_stack_trace.log")
+    assert _extract(data, chunk_size=7)["stack_traces"] == _extract(data)["stack_traces"]
+
+
+def test_gzip_matches_plain():
+    data = _fixture("java_stack_trace.log")
+    plain = _extract(data)
+    compressed = _extract(gzip.compress(data), chunk_size=16)
+    for key in ("lines", "errors", "stack_traces", "error_signatures"):
+        assert compressed[key] == plain[key]
+
+
+def test_gzip_chunk_expands_in_bounded_memory():
+    line = b"2026-03-02 10:15:02 INFO request ok\n"
+    bomb = gzip.compress(line * (64 * 1024 * 1024 // len(line)))
+    extractor = LogEvidenceExtractor()
+    tracemalloc.start()
+    try:
+        extractor.feed(bomb[:64 * 1024])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert extractor.decompressed_bytes > 16 * 1024 * 1024
+    assert peak < 16 * 1024 * 1024
+
+
+def test_decompressed_size_is_capped(monkeypatch):
+    monkeypatch.setattr(log_extractor, "LOG_MAX_DECOMPRESSED_BYTES", 4 * 1024 * 1024)
+    extractor = LogEvidenceExtractor()
+    with pytest.raises(LogTooLargeError):
+        extractor.feed(gzip.compress(b"x\n" * (8 * 1024 * 1024)))
+
+
+def test_time_range_ignores_untimestamped_first_and_last_lines():
+    data = (
+        b"=== service starting ===\n"
+        b"2024-05-01 10:00:02 INFO boot\n"
+        b"2024-05-01 10:07:41 ERROR Request failed\n"
+        b"java.lang.IllegalStateException: pool closed\n"
+        b"\tat com.acme.Pool.get(Pool.java:42)\n"
+        b"Caused by: java.io.IOException: broken pipe\n"
+        b"\t... 12 more\n"
+    )
+
+    for chunk_size in (len(data), 16):
+        summary = _extract(data, chunk_size)
+        assert summary["first_timestamp"] == "2024-05-01 10:00"
+        assert summary["last_timestamp"] == "2024-05-01 10:07"
+        assert "2024-05-01 10:00 .. 2024-05-01 10:07" in format_evidence(summary)
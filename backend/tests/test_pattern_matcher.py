@@ -0,0 +1,60 @@
+import glob
+import json
+import os
+
+from langchain.docstore.document import Document
+
+from pattern_matcher import PatternMatcher, load_library_signatures, parse_pattern_documents, templated_analysis
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "ERROR PATTERN LIBRARY")
+
+
+def _matcher() -> PatternMatcher:
+    docs = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "*"))):
+        with open(path, encoding="utf-8") as f:
+            item = json.load(f)
+        docs.append(Document(page_content=item["content"], metadata={**item["metadata"], "source_id": item["id"]}))
+    return PatternMatcher.from_documents(docs)
+
+
+def test_lone_keyword_in_longer_incident_falls_through():
+    text = "One batch pod was OOMKilled yesterday but recovered; DB CPU 95% and checkout latency p99 at 4s since 09:00"
+    assert _matcher().match(text) is None
+
+
+def test_negated_signature_is_ignored():
+    text = "We are NOT seeing too many connections errors, the pool looks healthy but requests are slow"
+    assert _matcher().find(text) == {}
+
+
+def test_several_signatures_match_with_derived_confidence():
+    text = (
+        "orders-api: HikariPool-1 - Connection is not available, request timed out after 30000ms; "
+        "postgres logs FATAL: too many connections for role app"
+    )
+    hit = _matcher().match(text)
+    assert hit is not None and hit["pattern"]["id"] == "DOC-PAT-003"
+    assert hit["distinct_signatures"] == 2
+    analysis = templated_analysis(hit)
+    assert analysis["confidence_score"] == hit["confidence"]
+    assert 0.5 < analysis["confidence_score"] < 0.95
+
+
+def test_signature_covering_most_of_the_input_matches():
+    hit = _matcher().match("Out of memory: Killed process 4312 (java)")
+    assert hit is not None and hit["pattern"]["id"] == "DOC-PAT-001"
+    assert hit["distinct_signatures"] == 1 and hit["coverage"] >= 0.5
+
+
+def test_library_signatures_fill_in_documents_indexed_without_them():
+    with open(os.path.join(DATA_DIR, "DOC-PAT-003.json"), encoding="utf-8") as f:
+        item = json.load(f)
+    # As in an index built before the library declared signatures or source ids.
+    doc = Document(page_content=item["content"], metadata={"category": "pattern"})
+
+    [bare] = parse_pattern_documents([doc])
+    [filled] = parse_pattern_documents([doc], load_library_signatures(DATA_DIR))
+
+    assert bare["signatures"] == ["Connection pool exhausted"]
+    assert "too many connections" in filled["signatures"]
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+
+import query_rag
+from embedding_backends import HashedTermEmbeddings
+from index_store import UNSHARDED
+
+
+def _live_state(tmp_path, count=5, dimension=16):
+    vectors = np.random.default_rng(0).normal(size=(count, dimension)).astype("float32")
+    store = FAISS.from_embeddings(
+        [(f"doc {i}", vector.tolist()) for i, vector in enumerate(vectors)],
+        HashedTermEmbeddings(dimension=dimension),
+    )
+    return {
+        "shard": UNSHARDED,
+        "path": str(tmp_path),
+        "version": "v1",
+        "vectorstore": store,
+        "full_vectors": None,
+        "coarse_index": None,
+        "patterns": [],
+        "loaded_at": 0.0,
+    }
+
+
+@pytest.fixture
+def live_index(tmp_path, monkeypatch):
+    state = _live_state(tmp_path)
+    monkeypatch.setattr(query_rag, "FAISS_INDEX_PATH", str(tmp_path))
+    monkeypatch.setattr(query_rag, "reload_index", lambda **kwargs: None)
+    monkeypatch.setattr(query_rag, "_active_index", query_rag._assemble({UNSHARDED: state}))
+    return state
+
+
+def _fail_publish(*args, **kwargs):
+    raise OSError("disk full")
+
+
+def test_failed_save_leaves_live_shard_untouched(live_index, monkeypatch):
+    monkeypatch.setattr(query_rag, "publish_snapshot", _fail_publish)
+    entry = {"content": "new doc", "metadata": {"category": "incident"}, "source_id": "DOC-1"}
+
+    with pytest.raises(OSError):
+        query_rag._add_to_shard(UNSHARDED, [entry], [[0.1] * 16])
+
+    assert query_rag._active_index["shards"][UNSHARDED] is live_index
+    assert live_index["vectorstore"].index.ntotal == 5
+    assert len(live_index["vectorstore"].index_to_docstore_id) == 5
+
+
+def test_failed_update_leaves_live_documents_untouched(live_index, monkeypatch):
+    store = live_index["vectorstore"]
+    doc_id = store.index_to_docstore_id[0]
+    store.docstore.search(doc_id).metadata["source_id"] = "DOC-LEARN-1"
+    monkeypatch.setattr(query_rag, "publish_snapshot", _fail_publish)
+
+    with pytest.raises(OSError):
+        query_rag.update_knowledge_document("rewritten", {"category": "incident"}, "DOC-LEARN-1")
+
+    assert store.docstore.search(doc_id).page_content == "doc 0"
+
+
+def test_save_publishes_a_copy_and_swaps_it_in(live_index):
+    entry = {"content": "new doc", "metadata": {"category": "incident"}, "source_id": "DOC-1"}
+
+    query_rag._add_to_shard(UNSHARDED, [entry], [[0.1] * 16])
+
+    published = query_rag._active_index["shards"][UNSHARDED]
+    assert published["vectorstore"].index.ntotal == 6
+    assert live_index["vectorstore"].index.ntotal == 5
+
+
+def test_save_skips_documents_already_indexed(live_index, monkeypatch):
+    entry = {"content": "new doc", "metadata": {"category": "incident"}, "source_id": "DOC-IMP-1"}
+    query_rag._add_to_shard(UNSHARDED, [entry], [[0.1] * 16])
+    published = query_rag._active_index["shards"][UNSHARDED]
+    monkeypatch.setattr(query_rag, "publish_snapshot", _fail_publish)
+
+    version = query_rag._add_to_shard(UNSHARDED, [entry], [[0.1] * 16])
+
+    assert version == published["version"]
+    assert query_rag._active_index["shards"][UNSHARDED] is published
+    assert published["vectorstore"].index.ntotal == 6
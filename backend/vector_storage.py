@@ -0,0 +1,174 @@
+import os
+from typing import Any
+
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from numpy.lib import format as npy_format
+
+# ==========================
+# CONFIG
+# ==========================
+
+# float32 keeps the exact IndexFlat; float16 / int8 store scalar-quantized codes
+# (2 / 1 bytes per dimension instead of 4).
+FAISS_VECTOR_STORAGE = os.getenv("FAISS_VECTOR_STORAGE", "float32").strip().lower()
+FAISS_RERANK_STORE = os.getenv("FAISS_RERANK_STORE", "true").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+FAISS_RERANK_OVERSAMPLE = max(1, int(os.getenv("FAISS_RERANK_OVERSAMPLE", "4")))
+# Two-stage search: scan a compact index of the first N dimensions (renormalised;
+# text-embedding-3 vectors are trained to stay meaningful when shortened), then
+# re-rank the candidates with full vectors. 0 disables the coarse stage.
+FAISS_COARSE_DIMENSIONS = int(os.getenv("FAISS_COARSE_DIMENSIONS", "0"))
+FAISS_COARSE_OVERSAMPLE = max(1, int(os.getenv("FAISS_COARSE_OVERSAMPLE", "8")))
+FULL_VECTORS_FILENAME = "vectors.f32.npy"
+# Rows copied per block when extending the re-rank store (16K x 3072 dims = 192 MB).
+FULL_VECTORS_COPY_ROWS = max(1, int(os.getenv("FAISS_VECTOR_COPY_ROWS", "16384")))
+COARSE_INDEX_FILENAME = "coarse.faiss"
+
+_QUANTIZER_TYPES = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+VECTOR_STORAGE_OPTIONS = {"float32", *_QUANTIZER_TYPES}
+if FAISS_VECTOR_STORAGE not in VECTOR_STORAGE_OPTIONS:
+    raise ValueError(
+        f"Unsupported FAISS_VECTOR_STORAGE '{FAISS_VECTOR_STORAGE}'. "
+        f"Use one of: {', '.join(sorted(VECTOR_STORAGE_OPTIONS))}."
+    )
+
+
+def is_quantized(index: faiss.Index) -> bool:
+    return isinstance(index, faiss.IndexScalarQuantizer)
+
+
+def build_index(vectors: np.ndarray, storage: str, metric_type: int = faiss.METRIC_L2) -> faiss.Index:
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    dimension = vectors.shape[1]
+    if storage == "float32":
+        index = faiss.IndexFlat(dimension, metric_type)
+    else:
+        index = faiss.IndexScalarQuantizer(dimension, _QUANTIZER_TYPES[storage], metric_type)
+        # int8 learns per-dimension ranges; fp16 training is a no-op.
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def exact_vectors(index: faiss.Index) -> np.ndarray | None:
+    """Full-precision vectors held by an exact index, or None for quantized ones."""
+    if is_quantized(index):
+        return None
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def save_full_vectors(directory: str, vectors: np.ndarray, appended: np.ndarray | None = None) -> None:
+    """Write ``vectors`` followed by any ``appended`` rows as one float32 .npy.
+
+    Rows are streamed in blocks, so a memory-mapped ``vectors`` is never read
+    into RAM as a whole.
+    """
+    blocks = [vectors] if appended is None else [vectors, np.asarray(appended, dtype="float32")]
+    rows = sum(len(block) for block in blocks)
+    header = {
+        "descr": npy_format.dtype_to_descr(np.dtype("float32")),
+        "fortran_order": False,
+        "shape": (rows, vectors.shape[1]),
+    }
+    with open(os.path.join(directory, FULL_VECTORS_FILENAME), "wb") as f:
+        npy_format.write_array_header_1_0(f, header)
+        for block in blocks:
+            for start in range(0, len(block), FULL_VECTORS_COPY_ROWS):
+                chunk = block[start:start + FULL_VECTORS_COPY_ROWS]
+                f.write(np.ascontiguousarray(chunk, dtype="float32").tobytes())
+
+
+def load_full_vectors(directory: str) -> np.ndarray | None:
+    path = os.path.join(directory, FULL_VECTORS_FILENAME)
+    if not os.path.exists(path):
+        return None
+    # Memory-mapped: pages are shared through the OS cache, not copied per worker,
+    # and only rows touched by a re-rank are read from disk.
+    return np.load(path, mmap_mode="r")
+
+
+def truncate_vectors(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    truncated = np.ascontiguousarray(np.asarray(vectors, dtype="float32")[:, :dimensions])
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    return truncated / np.maximum(norms, 1e-12)
+
+
+def build_coarse_index(full_vectors: np.ndarray, dimensions: int) -> faiss.Index:
+    return build_index(truncate_vectors(full_vectors, dimensions), "float32")
+
+
+def extend_coarse_index(coarse_index: faiss.Index, vectors: Any) -> faiss.Index:
+    """Copy of ``coarse_index`` with ``vectors`` appended, truncated to its dimensions."""
+    extended = faiss.clone_index(coarse_index)
+    extended.add(truncate_vectors(np.asarray(vectors, dtype="float32"), extended.d))
+    return extended
+
+
+def save_coarse_index(directory: str, index: faiss.Index) -> None:
+    faiss.write_index(index, os.path.join(directory, COARSE_INDEX_FILENAME))
+
+
+def load_coarse_index(directory: str) -> faiss.Index | None:
+    path = os.path.join(directory, COARSE_INDEX_FILENAME)
+    if not os.path.exists(path):
+        return None
+    return faiss.read_index(path)
+
+
+def _exact_order(index: faiss.Index, query: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        scores = rows @ query
+        return scores, np.argsort(-scores)
+    scores = ((rows - query) ** 2).sum(axis=1)
+    return scores, np.argsort(scores)
+
+
+def search_with_rerank(
+    store: Any,
+    query_vector: list[float],
+    k: int,
+    full_vectors: np.ndarray | None = None,
+    coarse_index: faiss.Index | None = None,
+) -> list[tuple[Document, float]]:
+    """Search a FAISS vectorstore, re-ranking approximate candidates exactly.
+
+    With ``coarse_index`` the candidates come from the truncated-dimension index;
+    otherwise from the main index, re-ranked only when it is quantized.
+    """
+    index = store.index
+    if index.ntotal == 0:
+        return []
+    query = np.asarray([query_vector], dtype="float32")
+    two_stage = coarse_index is not None and coarse_index.ntotal == index.ntotal
+    if two_stage:
+        fetch_k = min(index.ntotal, k * FAISS_COARSE_OVERSAMPLE)
+        distances, ids = coarse_index.search(truncate_vectors(query, coarse_index.d), fetch_k)
+        rerank = True
+    else:
+        rerank = is_quantized(index) and full_vectors is not None
+        fetch_k = min(index.ntotal, k * FAISS_RERANK_OVERSAMPLE if rerank else k)
+        distances, ids = index.search(query, fetch_k)
+
+    candidates = [(int(i), float(d)) for i, d in zip(ids[0], distances[0]) if i != -1]
+    if rerank and candidates:
+        candidate_ids = np.array([i for i, _ in candidates])
+        if full_vectors is not None:
+            rows = np.asarray(full_vectors[candidate_ids], dtype="float32")
+        else:
+            rows = np.vstack([index.reconstruct(int(i)) for i in candidate_ids])
+        scores, order = _exact_order(index, query[0], rows)
+        candidates = [(int(candidate_ids[pos]), float(scores[pos])) for pos in order]
+
+    return [
+        (store.docstore.search(store.index_to_docstore_id[i]), score)
+        for i, score in candidates[:k]
+    ]
@@ -2,6 +2,8 @@ import { useEffect, useMemo, useState } from "react";
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL ?? "http://127.0.0.1:8000";
 const HISTORY_STORAGE_KEY = "incident_analyzer_history_v1";
+// The API queues interactive UI requests ahead of scripted/batch callers.
+const PRIORITY_HEADERS = { "X-Request-Priority": "interactive" };
 
 function renderList(items) {
   if (!Array.isArray(items) || items.length === 0) {
@@ -91,7 +93,7 @@ function App() {
     try {
       const res = await fetch(`${API_BASE_URL}/analyze`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", ...PRIORITY_HEADERS },
         body: JSON.stringify({
           description: description.trim(),
           log_line: logLine.trim(),
@@ -102,33 +104,7 @@ function App() {
       if (!res.ok) {
         throw new Error(data?.detail || "Request failed.");
       }
-      setResponse(data);
-      const parsedOutput = data?.parsed_output ?? {};
-      setKbSummary(parsedOutput.executive_summary || "");
-      setKbRootCause(parsedOutput.root_cause || "");
-      setKbSeverity(parsedOutput.severity || "");
-      setKbResolution((parsedOutput.resolution_steps || []).join("\n"));
-      setKbPreventive((parsedOutput.preventive_actions || []).join("\n"));
-      setKbImpacted((parsedOutput.impacted_services || []).join(", "));
-      setKbIndicators((parsedOutput.indicators_detected || []).join(", "));
-      setKbConfidence(String(parsedOutput.confidence_score ?? ""));
-      setKbNotes("");
-      setSaveOpen(false);
-      setSaveMessage("");
-      setSaveError("");
-      setFollowupMessages([]);
-      setFollowupQuestion("");
-      setFollowupError("");
-      setHistory((prev) => {
-        const item = {
-          id: Date.now(),
-          createdAt: new Date().toISOString(),
-          description: description.trim(),
-          logLine: logLine.trim(),
-          response: data,
-        };
-        return [item, ...prev].slice(0, 12);
-      });
+      applyAnalysis(data, logLine.trim());
     } catch (err) {
       setError(err.message || "Unexpected error.");
     } finally {
@@ -136,6 +112,39 @@ function App() {
     }
   }
 
+  function applyAnalysis(data, analyzedLogLine) {
+    setResponse(data);
+    const parsedOutput = data?.parsed_output ?? {};
+    if (parsedOutput.refinement_job_id) {
+      pollRefinementJob(parsedOutput.refinement_job_id);
+    }
+    setKbSummary(parsedOutput.executive_summary || "");
+    setKbRootCause(parsedOutput.root_cause || "");
+    setKbSeverity(parsedOutput.severity || "");
+    setKbResolution((parsedOutput.resolution_steps || []).join("\n"));
+    setKbPreventive((parsedOutput.preventive_actions || []).join("\n"));
+    setKbImpacted((parsedOutput.impacted_services || []).join(", "));
+    setKbIndicators((parsedOutput.indicators_detected || []).join(", "));
+    setKbConfidence(String(parsedOutput.confidence_score ?? ""));
+    setKbNotes("");
+    setSaveOpen(false);
+    setSaveMessage("");
+    setSaveError("");
+    setFollowupMessages([]);
+    setFollowupQuestion("");
+    setFollowupError("");
+    setHistory((prev) => {
+      const item = {
+        id: Date.now(),
+        createdAt: new Date().toISOString(),
+        description: description.trim(),
+        logLine: analyzedLogLine,
+        response: data,
+      };
+      return [item, ...prev].slice(0, 12);
+    });
+  }
+
   function onSelectHistory(item) {
     setDescription(item.description || "");
     setLogLine(item.logLine || "");
@@ -154,8 +163,10 @@ function App() {
     const file = event.target.files?.[0];
     if (!file) return;
 
-    if (file.size > 2 * 1024 * 1024) {
-      setError("Log file is too large. Max allowed size is 2 MB.");
+    if (file.size > 2 * 1024 * 1024 || file.name.toLowerCase().endsWith(".gz")) {
+      // Large or compressed logs are streamed to the server, which extracts
+      // the error evidence and analyzes it directly.
+      await analyzeLogFile(file);
       event.target.value = "";
       return;
     }
@@ -172,6 +183,33 @@ function App() {
     }
   }
 
+  async function analyzeLogFile(file) {
+    setLoading(true);
+    setError("");
+    setResponse(null);
+    try {
+      const form = new FormData();
+      form.append("description", description.trim());
+      form.append("file", file);
+      const res = await fetch(`${API_BASE_URL}/analyze/logs`, {
+        method: "POST",
+        headers: PRIORITY_HEADERS,
+        body: form,
+      });
+      const data = await res.json();
+      if (!res.ok) {
+        throw new Error(data?.detail || "Log analysis failed.");
+      }
+      setLogLine(data.evidence);
+      setUploadedFileName(`${file.name} (${data.log_stats.lines} lines scanned)`);
+      applyAnalysis(data, data.evidence);
+    } catch (err) {
+      setError(err.message || "Unexpected error.");
+    } finally {
+      setLoading(false);
+    }
+  }
+
   async function onSaveKnowledge() {
     if (!response) return;
     setSaveLoading(true);
@@ -214,8 +252,9 @@ function App() {
       if (!res.ok) {
         throw new Error(data?.detail || "Failed to save knowledge.");
       }
-      setSaveMessage(`Saved to KB: ${data.id}`);
+      setSaveMessage(`Queued for KB indexing (job ${data.job_id}).`);
       setSaveOpen(false);
+      pollKnowledgeJob(data.job_id);
     } catch (err) {
       setSaveError(err.message || "Failed to save knowledge.");
     } finally {
@@ -223,6 +262,55 @@ function App() {
     }
   }
 
+  async function pollKnowledgeJob(jobId) {
+    for (let attempt = 0; attempt < 60; attempt += 1) {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      try {
+        const res = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+        const job = await res.json();
+        if (!res.ok) return;
+        if (job.status === "succeeded") {
+          const result = job.result || {};
+          setSaveMessage(
+            result.merged
+              ? `Merged into existing KB entry ${result.id} (seen ${result.occurrence_count} times).`
+              : `Saved to KB: ${result.id}`
+          );
+          return;
+        }
+        if (job.status === "failed") {
+          setSaveMessage("");
+          setSaveError(job.error || "Knowledge indexing failed.");
+          return;
+        }
+      } catch {
+        return;
+      }
+    }
+  }
+
+  async function pollRefinementJob(jobId) {
+    for (let attempt = 0; attempt < 60; attempt += 1) {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      try {
+        const res = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+        const job = await res.json();
+        if (!res.ok || job.status === "failed") return;
+        if (job.status === "succeeded") {
+          if (job.result?.parsed_output) {
+            // Only replace the pattern-library answer this job was refining.
+            setResponse((current) =>
+              current?.parsed_output?.refinement_job_id === jobId ? job.result : current
+            );
+          }
+          return;
+        }
+      } catch {
+        return;
+      }
+    }
+  }
+
   async function onFollowupSubmit(event) {
     event.preventDefault();
     if (!response || !followupQuestion.trim()) return;
@@ -236,7 +324,7 @@ function App() {
     try {
       const res = await fetch(`${API_BASE_URL}/followup`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", ...PRIORITY_HEADERS },
         body: JSON.stringify({
           description: description.trim(),
           log_line: logLine.trim(),
@@ -332,7 +420,7 @@ function App() {
               Upload Log File
               <input
                 type="file"
-                accept=".log,.txt,.json,.out,.csv,text/plain,application/json"
+                accept=".log,.txt,.json,.out,.csv,.gz,text/plain,application/json,application/gzip"
                 onChange={onLogFileUpload}
               />
               {uploadedFileName && (